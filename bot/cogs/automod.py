@@ -1,11 +1,14 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import re
 from collections import defaultdict
 import time
 import config
-from bot.utils.database import db
+from bot.utils.async_database import async_db
+from bot.utils.modlog_writer import modlog_writer
+from bot.utils.message_pipeline import STAGE_AUTOMOD
+from bot.utils.automod_rules import CompiledAutomod
+from bot.utils.metrics import metrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,66 +17,67 @@ class AutoMod(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.spam_tracker = defaultdict(list)  # {user_id: [timestamps]}
+        self.compiled = {}  # {guild_id: CompiledAutomod}
+        self.builds = 0
+    
+    async def cog_load(self):
+        self.bot.message_pipeline.register('automod', self.check_message, STAGE_AUTOMOD)
+        metrics.register_gauge('automod', self.stats)
+    
+    async def cog_unload(self):
+        self.bot.message_pipeline.unregister('automod')
+        metrics.unregister_gauge('automod')
+    
+    def rules_for(self, guild_id: int, automod_settings):
+        """Reglas compiladas del servidor; solo se reconstruyen si su configuración cambió"""
+        version = async_db.config_version('automod_config', guild_id)
+        rules = self.compiled.get(guild_id)
+        if rules is not None and rules.version == version and rules.source is automod_settings:
+            return rules
+        
+        # Otra versión o una instantánea recargada: recompilar solo si el contenido es distinto
+        if rules is None or rules.source != automod_settings:
+            rules = self.compiled[guild_id] = CompiledAutomod(automod_settings, version)
+            self.builds += 1
+        else:
+            rules.source = automod_settings
+            rules.version = version
+        return rules
+    
+    def stats(self) -> dict:
+        return {'compiled': len(self.compiled), 'builds': self.builds}
     
     @commands.Cog.listener()
-    async def on_message(self, message):
-        """Verificar mensajes para automoderación"""
-        # Ignorar bots y mensajes sin servidor
-        if message.author.bot or not message.guild:
-            return
+    async def on_guild_remove(self, guild):
+        self.compiled.pop(guild.id, None)
+    
+    async def check_message(self, message, settings):
+        """Etapa del pipeline de mensajes: automoderación.
+        
+        Devuelve True si el mensaje se eliminó o el autor fue silenciado.
+        """
+        # Verificar si automod está habilitado
+        if not settings.automod_enabled:
+            return False
         
         # Ignorar administradores
         if message.author.guild_permissions.administrator:
-            return
+            return False
         
-        # Verificar si automod está habilitado
-        guild_config = db.get_guild_config(message.guild.id)
-        if not guild_config or not guild_config.get('automod_enabled', True):
-            return
-        
-        # Obtener configuración de automod
-        automod_config = db.get_automod_config(message.guild.id)
-        if not automod_config:
-            return
+        automod_config = settings.automod
         
         # Verificar anti-spam
-        if automod_config.get('anti_spam', True):
+        if automod_config.anti_spam:
             if await self.check_spam(message):
-                return
+                return True
         
-        # Verificar menciones excesivas
-        max_mentions = automod_config.get('max_mentions', config.MAX_MENTIONS)
-        if len(message.mentions) > max_mentions:
-            await self.delete_and_warn(message, f"Demasiadas menciones (máximo {max_mentions})")
-            return
-        
-        # Verificar emojis excesivos
-        max_emojis = automod_config.get('max_emojis', config.MAX_EMOJIS)
-        emoji_count = len(re.findall(r'<a?:\w+:\d+>', message.content))
-        if emoji_count > max_emojis:
-            await self.delete_and_warn(message, f"Demasiados emojis (máximo {max_emojis})")
-            return
+        # Menciones, invitaciones, enlaces, palabras prohibidas y emojis (de la regla más barata a la más cara)
+        reason = self.rules_for(message.guild.id, automod_config).check(message)
+        if reason:
+            await self.delete_and_warn(message, reason)
+            return True
         
-        # Verificar invitaciones de Discord
-        if automod_config.get('anti_invites', True):
-            if re.search(r'discord\.gg/|discordapp\.com/invite/', message.content, re.IGNORECASE):
-                await self.delete_and_warn(message, "Invitaciones de Discord no permitidas")
-                return
-        
-        # Verificar enlaces
-        if automod_config.get('anti_links', False):
-            if re.search(r'https?://|www\.', message.content, re.IGNORECASE):
-                await self.delete_and_warn(message, "Enlaces no permitidos")
-                return
-        
-        # Verificar palabras prohibidas
-        bad_words = automod_config.get('bad_words', [])
-        if bad_words:
-            content_lower = message.content.lower()
-            for word in bad_words:
-                if word.lower() in content_lower:
-                    await self.delete_and_warn(message, "Lenguaje inapropiado")
-                    return
+        return False
     
     async def check_spam(self, message):
         """Verificar si un mensaje es spam"""
@@ -114,7 +118,7 @@ class AutoMod(commands.Cog):
             await warning_msg.delete(delay=5)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 message.guild.id,
                 message.author.id,
                 self.bot.user.id,
@@ -138,7 +142,7 @@ class AutoMod(commands.Cog):
             await message.channel.send(embed=embed)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 message.guild.id,
                 message.author.id,
                 self.bot.user.id,
@@ -152,7 +156,7 @@ class AutoMod(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def automod_config(self, interaction: discord.Interaction):
         """Mostrar configuración de automoderación"""
-        automod_config = db.get_automod_config(interaction.guild.id)
+        automod_config = await async_db.get_automod_config(interaction.guild.id)
         
         if not automod_config:
             await interaction.response.send_message("❌ Error al obtener configuración.", ephemeral=True)
@@ -201,10 +205,10 @@ class AutoMod(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def toggle_spam(self, interaction: discord.Interaction):
         """Activar/desactivar anti-spam"""
-        automod_config = db.get_automod_config(interaction.guild.id)
+        automod_config = await async_db.get_automod_config(interaction.guild.id)
         current = automod_config.get('anti_spam', True)
         
-        db.update_automod_config(interaction.guild.id, anti_spam=not current)
+        await async_db.update_automod_config(interaction.guild.id, anti_spam=not current)
         
         status = "desactivado" if current else "activado"
         await interaction.response.send_message(f"✅ Anti-spam {status}.", ephemeral=True)
@@ -213,10 +217,10 @@ class AutoMod(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def toggle_invites(self, interaction: discord.Interaction):
         """Activar/desactivar anti-invitaciones"""
-        automod_config = db.get_automod_config(interaction.guild.id)
+        automod_config = await async_db.get_automod_config(interaction.guild.id)
         current = automod_config.get('anti_invites', True)
         
-        db.update_automod_config(interaction.guild.id, anti_invites=not current)
+        await async_db.update_automod_config(interaction.guild.id, anti_invites=not current)
         
         status = "desactivado" if current else "activado"
         await interaction.response.send_message(f"✅ Anti-invitaciones {status}.", ephemeral=True)
@@ -225,10 +229,10 @@ class AutoMod(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def toggle_links(self, interaction: discord.Interaction):
         """Activar/desactivar anti-enlaces"""
-        automod_config = db.get_automod_config(interaction.guild.id)
+        automod_config = await async_db.get_automod_config(interaction.guild.id)
         current = automod_config.get('anti_links', False)
         
-        db.update_automod_config(interaction.guild.id, anti_links=not current)
+        await async_db.update_automod_config(interaction.guild.id, anti_links=not current)
         
         status = "desactivado" if current else "activado"
         await interaction.response.send_message(f"✅ Anti-enlaces {status}.", ephemeral=True)
@@ -0,0 +1,79 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import tempfile
+import config
+from bot.utils.async_database import async_db
+from bot.utils.database import db
+from bot.utils.export import export_guild_data, export_filename
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Export(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @staticmethod
+    def _write_export(guild_id: int, dataset: str, fmt: str, max_bytes: int):
+        """Escribir el export comprimido en un archivo temporal (en memoria hasta EXPORT_SPOOL_SIZE).
+
+        Deja de leer la base de datos en cuanto el archivo pasa de `max_bytes`.
+        """
+        file = tempfile.SpooledTemporaryFile(max_size=config.EXPORT_SPOOL_SIZE)
+        try:
+            for chunk in export_guild_data(db, guild_id, dataset, fmt):
+                file.write(chunk)
+                if file.tell() > max_bytes:
+                    break
+        except Exception:
+            file.close()
+            raise
+        return file
+
+    @app_commands.command(name="exportar", description="Exportar los usuarios o los logs de moderación del servidor (Admin)")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.choices(
+        datos=[
+            app_commands.Choice(name="Usuarios y XP", value="users"),
+            app_commands.Choice(name="Logs de moderación", value="modlogs")
+        ],
+        formato=[
+            app_commands.Choice(name="CSV", value="csv"),
+            app_commands.Choice(name="JSONL", value="jsonl")
+        ]
+    )
+    async def export(self, interaction: discord.Interaction, datos: app_commands.Choice[str],
+                     formato: app_commands.Choice[str] = None):
+        """Enviar un export comprimido de los datos del servidor"""
+        fmt = formato.value if formato else 'csv'
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            file = await async_db.run(
+                self._write_export, interaction.guild.id, datos.value, fmt, interaction.guild.filesize_limit
+            )
+        except Exception as e:
+            logger.error(f"Error exporting {datos.value}: {e}")
+            await interaction.followup.send("❌ Error al exportar los datos.", ephemeral=True)
+            return
+
+        try:
+            if file.tell() > interaction.guild.filesize_limit:
+                await interaction.followup.send(
+                    "⚠️ El export es demasiado grande para Discord. Descárgalo desde el panel web.",
+                    ephemeral=True
+                )
+                return
+
+            file.seek(0)
+            await interaction.followup.send(
+                f"📦 Export de **{datos.name}**",
+                file=discord.File(file, filename=export_filename(interaction.guild.id, datos.value, fmt)),
+                ephemeral=True
+            )
+        finally:
+            file.close()
+
+async def setup(bot):
+    await bot.add_cog(Export(bot))
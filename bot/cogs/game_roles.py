@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from bot.utils.database import db
+from bot.utils.async_database import async_db
 import logging
 
 logger = logging.getLogger(__name__)
@@ -106,7 +106,7 @@ class GameRoles(commands.Cog):
             await interaction.response.defer(ephemeral=True)
             
             # Obtener configuración de roles de juegos
-            game_roles_config = db.get_game_roles_config(interaction.guild.id)
+            game_roles_config = await async_db.get_game_roles_config(interaction.guild.id)
             
             if not game_roles_config or not game_roles_config.get('roles'):
                 await interaction.followup.send(
@@ -155,7 +155,7 @@ class GameRoles(commands.Cog):
             message = await canal.send(embed=embed, view=view)
             
             # Guardar ID del mensaje
-            db.update_game_roles_config(
+            await async_db.update_game_roles_config(
                 interaction.guild.id,
                 channel_id=str(canal.id),
                 message_id=str(message.id)
@@ -181,7 +181,7 @@ class GameRoles(commands.Cog):
         """Agregar un rol de juego a la configuración"""
         try:
             # Obtener configuración actual
-            game_roles_config = db.get_game_roles_config(interaction.guild.id)
+            game_roles_config = await async_db.get_game_roles_config(interaction.guild.id)
             
             if not game_roles_config:
                 game_roles_config = {'roles': {}}
@@ -189,7 +189,7 @@ class GameRoles(commands.Cog):
             roles_data = game_roles_config.get('roles', {})
             roles_data[juego] = str(rol.id)
             
-            db.update_game_roles_config(
+            await async_db.update_game_roles_config(
                 interaction.guild.id,
                 roles=roles_data
             )
@@ -223,7 +223,7 @@ class GameRoles(commands.Cog):
     async def remove_game_role(self, interaction: discord.Interaction, juego: str):
         """Remover un rol de juego de la configuración"""
         try:
-            game_roles_config = db.get_game_roles_config(interaction.guild.id)
+            game_roles_config = await async_db.get_game_roles_config(interaction.guild.id)
             
             if not game_roles_config or not game_roles_config.get('roles'):
                 await interaction.response.send_message(
@@ -243,7 +243,7 @@ class GameRoles(commands.Cog):
             
             del roles_data[juego]
             
-            db.update_game_roles_config(
+            await async_db.update_game_roles_config(
                 interaction.guild.id,
                 roles=roles_data
             )
@@ -262,7 +262,7 @@ class GameRoles(commands.Cog):
     async def list_game_roles(self, interaction: discord.Interaction):
         """Listar roles de juegos configurados"""
         try:
-            game_roles_config = db.get_game_roles_config(interaction.guild.id)
+            game_roles_config = await async_db.get_game_roles_config(interaction.guild.id)
             
             if not game_roles_config or not game_roles_config.get('roles'):
                 await interaction.response.send_message(
@@ -303,7 +303,7 @@ class GameRoles(commands.Cog):
 
         try:
             # Recuperar roles desde la base de datos
-            roles_config = db.get_roles_config(interaction.guild.id)
+            roles_config = await async_db.get_roles_config(interaction.guild.id)
             if not roles_config:
                 await interaction.followup.send("❌ No hay roles configurados.", ephemeral=True)
                 return
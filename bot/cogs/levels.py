@@ -1,9 +1,17 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import io
 import time
 import config
-from bot.utils.database import db
+from bot.utils.async_database import async_db
+from bot.utils.xp_ledger import XPLedger
+from bot.utils.cooldowns import CooldownStore
+from bot.utils.levelup_announcer import LevelUpAnnouncer
+from bot.utils.rank_cards import rank_cards
+from bot.utils.level_curve import CURVES, default_curve, get_curve
+from bot.utils.metrics import metrics
+from bot.utils.message_pipeline import STAGE_LEVELS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,66 +19,84 @@ logger = logging.getLogger(__name__)
 class Levels(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.xp_cooldowns = {}  # {user_id: timestamp}
+        self.xp_cooldowns = CooldownStore(config.XP_COOLDOWN)
+        self.ledger = XPLedger(async_db)
+        self.announcer = LevelUpAnnouncer()
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Otorgar XP por mensajes"""
-        # Ignorar bots y mensajes sin servidor
-        if message.author.bot or not message.guild:
-            return
-        
+    async def cog_load(self):
+        self.ledger.start()
+        self.bot.message_pipeline.register('levels', self.grant_xp, STAGE_LEVELS)
+        metrics.register_gauge('levels.xp_ledger', self.ledger.stats)
+        metrics.register_gauge('levels.xp_cooldowns', self.xp_cooldowns.stats)
+        metrics.register_gauge('levels.announcer', self.announcer.stats)
+    
+    async def cog_unload(self):
+        # Guardar la XP pendiente antes de descargar el cog (incluye el apagado del bot)
+        self.bot.message_pipeline.unregister('levels')
+        metrics.unregister_gauge('levels.xp_ledger')
+        metrics.unregister_gauge('levels.xp_cooldowns')
+        metrics.unregister_gauge('levels.announcer')
+        await self.announcer.stop()
+        await self.ledger.stop()
+    
+    async def grant_xp(self, message, settings):
+        """Etapa del pipeline de mensajes: encolar la XP del mensaje con prioridad baja"""
         # Verificar si el sistema de niveles está habilitado
-        guild_config = db.get_guild_config(message.guild.id)
-        if not guild_config or not guild_config.get('levels_enabled', True):
+        if not settings.levels_enabled:
             return
         
-        # Verificar cooldown
+        # Verificar y actualizar cooldown (por servidor)
         user_id = message.author.id
-        current_time = time.time()
-        
-        if user_id in self.xp_cooldowns:
-            if current_time - self.xp_cooldowns[user_id] < config.XP_COOLDOWN:
-                return
-        
-        # Actualizar cooldown
-        self.xp_cooldowns[user_id] = current_time
+        if not self.xp_cooldowns.try_acquire(message.guild.id, user_id):
+            return
         
-        # Agregar XP
-        result = db.add_xp(message.guild.id, user_id, config.XP_PER_MESSAGE)
+        # Si el planificador la descarta por sobrecarga, el siguiente mensaje puede volver a intentarlo
+        if not self.bot.scheduler.submit('xp', 'levels.add_xp', self.add_message_xp, message, settings):
+            self.xp_cooldowns.clear(message.guild.id, user_id)
+    
+    async def add_message_xp(self, message, settings):
+        """Otorgar XP por un mensaje y anunciar la subida de nivel"""
+        result = await self.ledger.add_xp(message.guild.id, message.author.id, config.XP_PER_MESSAGE, settings.curve)
         
         if result and result['leveled_up']:
-            # Notificar subida de nivel
-            embed = discord.Embed(
-                title="🎉 ¡Subida de Nivel!",
-                description=f"{message.author.mention} ha alcanzado el **Nivel {result['new_level']}**!",
-                color=discord.Color.gold()
-            )
-            await message.channel.send(embed=embed)
+            # Notificar subida de nivel (en el canal configurado o en el del mensaje)
+            channel = message.channel
+            if settings.levelup_channel_id:
+                channel = message.guild.get_channel(int(settings.levelup_channel_id)) or channel
+            self.announcer.announce(channel, message.author, result['new_level'])
     
     @app_commands.command(name="nivel", description="Ver tu nivel y experiencia")
     async def level(self, interaction: discord.Interaction, usuario: discord.Member = None):
         """Ver nivel de un usuario"""
         target = usuario or interaction.user
+        # La tarjeta puede tardar más que el plazo de respuesta de una interacción
+        await interaction.response.defer()
         
-        user_data = db.get_user_level(interaction.guild.id, target.id)
+        # Los totales en memoria incluyen la XP aún no guardada
+        user_data = self.ledger.peek(interaction.guild.id, target.id)
+        if not user_data:
+            user_data = await async_db.get_user_level(interaction.guild.id, target.id)
         
         if not user_data:
-            await interaction.response.send_message("No se encontraron datos para este usuario.", ephemeral=True)
+            await interaction.followup.send("No se encontraron datos para este usuario.")
             return
         
         level = user_data['level']
         xp = user_data['xp']
         messages = user_data['messages']
         
-        # Calcular XP para siguiente nivel
-        xp_needed = db.xp_for_level(level + 1)
-        xp_progress = xp - db.xp_for_level(level)
-        xp_for_next = xp_needed - db.xp_for_level(level)
+        # Calcular XP para siguiente nivel con la curva del servidor
+        settings = await async_db.get_guild_settings(interaction.guild.id)
+        curve = settings.curve if settings else default_curve
+        level_xp = curve.xp_for_level(level)
+        xp_progress = max(xp - level_xp, 0)
+        xp_for_next = curve.xp_for_level(level + 1) - level_xp
+        # El nivel guardado puede ir por detrás de la XP (por ejemplo, tras cambiar la curva)
+        ratio = min(xp_progress / xp_for_next, 1.0)
         
         # Crear barra de progreso
         progress_bar_length = 20
-        progress = int((xp_progress / xp_for_next) * progress_bar_length)
+        progress = int(ratio * progress_bar_length)
         progress_bar = "█" * progress + "░" * (progress_bar_length - progress)
         
         embed = discord.Embed(
@@ -81,14 +107,44 @@ class Levels(commands.Cog):
         embed.add_field(name="Nivel", value=f"**{level}**", inline=True)
         embed.add_field(name="XP", value=f"{xp_progress}/{xp_for_next}", inline=True)
         embed.add_field(name="Mensajes", value=f"{messages}", inline=True)
-        embed.add_field(name="Progreso", value=f"`{progress_bar}` {int((xp_progress/xp_for_next)*100)}%", inline=False)
+        embed.add_field(name="Progreso", value=f"`{progress_bar}` {int(ratio * 100)}%", inline=False)
+        
+        # Posición en el ranking y usuarios justo por encima y por debajo
+        rank = await async_db.get_user_rank(interaction.guild.id, target.id)
+        if rank:
+            embed.add_field(name="Ranking", value=f"**#{rank['rank']}** de {rank['total']}", inline=True)
+            position = rank['rank'] - len(rank['above'])
+            lines = []
+            for user_row in rank['above'] + [rank['user']] + rank['below']:
+                name = self._member_name(interaction.guild, int(user_row['user_id']))
+                if user_row['user_id'] == rank['user']['user_id']:
+                    name = f"**{name}**"
+                lines.append(f"#{position} {name} - Nivel {user_row['level']} | {user_row['xp']} XP")
+                position += 1
+            embed.add_field(name="Alrededor", value="\n".join(lines), inline=False)
+        
+        # Tarjeta con avatar, nivel, posición y barra (cacheada mientras no cambien)
+        card = await rank_cards.render(
+            interaction.guild.id, target, level, ratio, rank['rank'] if rank else None
+        )
+        if card is None:
+            await interaction.followup.send(embed=embed)
+            return
         
-        await interaction.response.send_message(embed=embed)
+        filename = f"nivel.{rank_cards.extension}"
+        embed.set_image(url=f"attachment://{filename}")
+        embed.set_thumbnail(url=None)
+        await interaction.followup.send(embed=embed, file=discord.File(io.BytesIO(card), filename=filename))
+    
+    def _member_name(self, guild: discord.Guild, user_id: int) -> str:
+        """Nombre visible de un miembro o un texto genérico si ya no está en el servidor"""
+        member = guild.get_member(user_id)
+        return member.display_name if member else f"Usuario {user_id}"
     
     @app_commands.command(name="ranking", description="Ver la tabla de clasificación del servidor")
     async def leaderboard(self, interaction: discord.Interaction):
         """Mostrar tabla de clasificación"""
-        leaderboard = db.get_leaderboard(interaction.guild.id, 10)
+        leaderboard = await async_db.get_leaderboard(interaction.guild.id, 10)
         
         if not leaderboard:
             await interaction.response.send_message("No hay datos de clasificación aún.", ephemeral=True)
@@ -128,12 +184,58 @@ class Levels(commands.Cog):
         
         await interaction.response.send_message(embed=embed)
     
+    @app_commands.command(name="curvaniveles", description="Cambiar la curva de niveles y recalcular los niveles (Admin)")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.choices(curva=[app_commands.Choice(name=name, value=name) for name in CURVES])
+    async def level_curve(self, interaction: discord.Interaction, curva: app_commands.Choice[str],
+                          multiplicador: app_commands.Range[int, 1, 1000000] = config.LEVEL_MULTIPLIER):
+        """Cambiar la curva de niveles del servidor y recalcular el nivel de todos los usuarios"""
+        await interaction.response.defer(ephemeral=True)
+        guild_id = interaction.guild.id
+        
+        if not await async_db.update_guild_config(guild_id, level_curve=curva.value, level_multiplier=multiplicador):
+            await interaction.followup.send("❌ Error al guardar la curva de niveles.", ephemeral=True)
+            return
+        
+        curve = get_curve(curva.value, multiplicador)
+        # Guardar la XP pendiente para que el recálculo vea los totales actuales
+        await self.ledger.flush()
+        start = time.perf_counter()
+        stats = await async_db.recompute_levels(guild_id, curve)
+        elapsed = time.perf_counter() - start
+        self.ledger.refresh_levels(guild_id, curve)
+        
+        if stats is None:
+            await interaction.followup.send("⚠️ Curva guardada, pero falló el recálculo de niveles. Vuelve a intentarlo.", ephemeral=True)
+            return
+        
+        await interaction.followup.send(
+            f"✅ Curva `{curva.value}` (x{multiplicador}) aplicada: {stats['changed']} de {stats['scanned']} "
+            f"usuarios cambiaron de nivel ({elapsed:.1f}s).",
+            ephemeral=True
+        )
+    
+    @app_commands.command(name="canalniveles", description="Canal para los anuncios de subida de nivel (Admin)")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(canal="Canal de los anuncios; vacío para anunciar en el canal del mensaje")
+    async def levelup_channel(self, interaction: discord.Interaction, canal: discord.TextChannel = None):
+        """Configurar el canal de los anuncios de subida de nivel"""
+        channel_id = str(canal.id) if canal else None
+        if not await async_db.update_guild_config(interaction.guild.id, levelup_channel_id=channel_id):
+            await interaction.response.send_message("❌ Error al guardar el canal de anuncios.", ephemeral=True)
+            return
+        
+        if canal:
+            await interaction.response.send_message(f"✅ Las subidas de nivel se anunciarán en {canal.mention}.", ephemeral=True)
+        else:
+            await interaction.response.send_message("✅ Las subidas de nivel se anunciarán en el canal de cada mensaje.", ephemeral=True)
+    
     @app_commands.command(name="resetxp", description="Resetear XP de un usuario (Admin)")
     @app_commands.checks.has_permissions(administrator=True)
     async def reset_xp(self, interaction: discord.Interaction, usuario: discord.Member):
         """Resetear XP de un usuario"""
         try:
-            db.create_user(interaction.guild.id, usuario.id)
+            await self.ledger.reset_user(interaction.guild.id, usuario.id)
             await interaction.response.send_message(f"✅ XP de {usuario.mention} ha sido reseteado.", ephemeral=True)
         except Exception as e:
             logger.error(f"Error resetting XP: {e}")
@@ -1,7 +1,10 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from bot.utils.database import db
+from bot.utils.async_database import async_db
+from bot.utils.database import MODERATION_ACTIONS
+from bot.utils.modlog_writer import modlog_writer
+import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,7 +35,7 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 interaction.guild.id,
                 usuario.id,
                 interaction.user.id,
@@ -65,7 +68,7 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 interaction.guild.id,
                 usuario.id,
                 interaction.user.id,
@@ -94,7 +97,7 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 interaction.guild.id,
                 user.id,
                 interaction.user.id,
@@ -131,7 +134,7 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 interaction.guild.id,
                 usuario.id,
                 interaction.user.id,
@@ -159,7 +162,7 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 interaction.guild.id,
                 usuario.id,
                 interaction.user.id,
@@ -186,7 +189,7 @@ class Moderation(commands.Cog):
             await interaction.followup.send(f"✅ Se eliminaron {len(deleted)} mensajes.", ephemeral=True)
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 interaction.guild.id,
                 interaction.user.id,
                 interaction.user.id,
@@ -225,7 +228,7 @@ class Moderation(commands.Cog):
                 pass
             
             # Registrar en logs
-            db.log_moderation(
+            modlog_writer.log(
                 interaction.guild.id,
                 usuario.id,
                 interaction.user.id,
@@ -238,14 +241,35 @@ class Moderation(commands.Cog):
     
     @app_commands.command(name="modlogs", description="Ver logs de moderación")
     @app_commands.checks.has_permissions(moderate_members=True)
-    async def modlogs(self, interaction: discord.Interaction, limite: int = 10):
+    @app_commands.describe(
+        usuario="Solo acciones contra este usuario",
+        moderador="Solo acciones de este moderador",
+        accion="Solo este tipo de acción",
+        dias="Solo los últimos N días"
+    )
+    @app_commands.choices(accion=[app_commands.Choice(name=action, value=action) for action in MODERATION_ACTIONS])
+    async def modlogs(self, interaction: discord.Interaction, limite: int = 10, usuario: discord.User = None,
+                      moderador: discord.Member = None, accion: app_commands.Choice[str] = None, dias: int = None):
         """Ver logs de moderación"""
         try:
             if limite < 1 or limite > 50:
                 await interaction.response.send_message("❌ El límite debe estar entre 1 y 50.", ephemeral=True)
                 return
+            if dias is not None and dias < 1:
+                await interaction.response.send_message("❌ Los días deben ser al menos 1.", ephemeral=True)
+                return
+            
+            filters = {}
+            if usuario:
+                filters['user_id'] = usuario.id
+            if moderador:
+                filters['moderator_id'] = moderador.id
+            if accion:
+                filters['action'] = accion.value
+            if dias:
+                filters['since'] = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=dias)
             
-            logs = db.get_moderation_logs(interaction.guild.id, limite)
+            logs = await async_db.get_moderation_logs(interaction.guild.id, limite, **filters)
             
             if not logs:
                 await interaction.response.send_message("No hay logs de moderación.", ephemeral=True)
@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from bot.utils.database import db
+from bot.utils.async_database import async_db
 import logging
 import datetime
 
@@ -67,17 +67,19 @@ class Verification(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        """Enviar mensaje de verificación cuando un usuario se une"""
+        """Encolar el mensaje de verificación (prioridad de moderación) cuando un usuario se une"""
+        self.bot.scheduler.submit('moderation', 'verification.send', self.send_verification, member)
+    
+    async def send_verification(self, member):
+        """Enviar mensaje de verificación"""
         try:
-            guild_config = db.get_guild_config(member.guild.id)
-            if not guild_config or not guild_config.get('verification_enabled', False):
+            settings = await async_db.get_guild_settings(member.guild.id)
+            if not settings or not settings.verification_enabled:
                 return
             
-            verification_config = db.get_verification_config(member.guild.id)
-            if not verification_config:
-                return
+            verification_config = settings.verification
             
-            channel_id = verification_config.get('channel_id')
+            channel_id = verification_config.channel_id
             if not channel_id:
                 return
             
@@ -88,12 +90,12 @@ class Verification(commands.Cog):
             # Usar el generador de embed personalizado
             embed = self._create_verification_embed(
                 member.guild, 
-                verification_config.get('verified_role_id'),
-                verification_config.get('message')
+                verification_config.verified_role_id,
+                verification_config.message
             )
             
             # Crear botón verde específico
-            view = VerificationView(member.id, verification_config.get('verified_role_id'))
+            view = VerificationView(member.id, verification_config.verified_role_id)
             
             await channel.send(embed=embed, view=view)
         
@@ -111,13 +113,13 @@ class Verification(commands.Cog):
         """Configurar sistema de verificación y enviar panel"""
         try:
             # Actualizar configuración
-            db.update_verification_config(
+            await async_db.update_verification_config(
                 interaction.guild.id,
                 channel_id=str(canal.id),
                 verified_role_id=str(rol_verificado.id)
             )
             
-            db.update_guild_config(interaction.guild.id, verification_enabled=True)
+            await async_db.update_guild_config(interaction.guild.id, verification_enabled=True)
             
             # Generar el embed visualmente idéntico a la imagen
             embed_panel = self._create_verification_embed(
@@ -149,7 +151,7 @@ class Verification(commands.Cog):
     async def manual_verify(self, interaction: discord.Interaction, usuario: discord.Member):
         """Verificar manualmente a un usuario"""
         try:
-            verification_config = db.get_verification_config(interaction.guild.id)
+            verification_config = await async_db.get_verification_config(interaction.guild.id)
             if not verification_config or not verification_config.get('verified_role_id'):
                 await interaction.response.send_message("❌ Sistema de verificación no configurado.", ephemeral=True)
                 return
@@ -168,9 +170,9 @@ class Verification(commands.Cog):
     async def toggle_verification(self, interaction: discord.Interaction):
         """Activar/desactivar sistema de verificación"""
         try:
-            guild_config = db.get_guild_config(interaction.guild.id)
+            guild_config = await async_db.get_guild_config(interaction.guild.id)
             current = guild_config.get('verification_enabled', False)
-            db.update_guild_config(interaction.guild.id, verification_enabled=not current)
+            await async_db.update_guild_config(interaction.guild.id, verification_enabled=not current)
             status = "desactivado" if current else "activado"
             await interaction.response.send_message(f"✅ Sistema de verificación {status}.", ephemeral=True)
         except Exception as e:
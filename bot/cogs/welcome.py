@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from bot.utils.database import db
+from bot.utils.async_database import async_db
 from bot.utils.image_gen import image_generator
 import logging
 import config  # <--- Asegúrate de importar config aquí
@@ -14,20 +14,22 @@ class Welcome(commands.Cog):
     
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        """Enviar mensaje de bienvenida cuando un usuario se une"""
+        """Encolar el mensaje de bienvenida cuando un usuario se une"""
+        self.bot.scheduler.submit('welcome', 'welcome.send', self.send_welcome, member)
+    
+    async def send_welcome(self, member):
+        """Enviar mensaje de bienvenida"""
         try:
             # Verificar si el sistema de bienvenida está habilitado
-            guild_config = db.get_guild_config(member.guild.id)
-            if not guild_config or not guild_config.get('welcome_enabled', False):
+            settings = await async_db.get_guild_settings(member.guild.id)
+            if not settings or not settings.welcome_enabled:
                 return
             
             # Obtener configuración de bienvenida
-            welcome_config = db.get_welcome_config(member.guild.id)
-            if not welcome_config:
-                return
+            welcome_config = settings.welcome
             
             # Obtener canal de bienvenida
-            channel_id = welcome_config.get('channel_id')
+            channel_id = welcome_config.channel_id
             if not channel_id:
                 return
             
@@ -36,7 +38,7 @@ class Welcome(commands.Cog):
                 return
             
             # Preparar mensaje
-            message_template = welcome_config.get('message', '¡Bienvenido {user} a {server}!')
+            message_template = welcome_config.message
             message_text = message_template.format(
                 user=member.mention,
                 server=member.guild.name,
@@ -44,12 +46,12 @@ class Welcome(commands.Cog):
             )
             
             # Generar imagen si está habilitada
-            if welcome_config.get('image_enabled', True):
+            if welcome_config.image_enabled:
                 try:
                     avatar_url = member.display_avatar.url
-                    bg_color = welcome_config.get('image_background', '#7289da')
-                    text_color = welcome_config.get('image_text_color', '#ffffff')
-                    background_image_url = welcome_config.get('background_image_url')
+                    bg_color = welcome_config.image_background
+                    text_color = welcome_config.image_text_color
+                    background_image_url = welcome_config.background_image_url
                     
                     # --- CORRECCIÓN AQUÍ ---
                     # Convertir ruta relativa a absoluta usando localhost
@@ -109,8 +111,8 @@ class Welcome(commands.Cog):
     async def set_welcome(self, interaction: discord.Interaction, canal: discord.TextChannel):
         """Configurar canal de bienvenida"""
         try:
-            db.update_welcome_config(interaction.guild.id, channel_id=str(canal.id))
-            db.update_guild_config(interaction.guild.id, welcome_enabled=True)
+            await async_db.update_welcome_config(interaction.guild.id, channel_id=str(canal.id))
+            await async_db.update_guild_config(interaction.guild.id, welcome_enabled=True)
             await interaction.response.send_message(f"✅ Canal de bienvenida configurado en {canal.mention}", ephemeral=True)
         except Exception as e:
             logger.error(f"Error setting welcome channel: {e}")
@@ -121,7 +123,7 @@ class Welcome(commands.Cog):
     async def welcome_message(self, interaction: discord.Interaction, mensaje: str):
         """Configurar mensaje de bienvenida"""
         try:
-            db.update_welcome_config(interaction.guild.id, message=mensaje)
+            await async_db.update_welcome_config(interaction.guild.id, message=mensaje)
             
             embed = discord.Embed(
                 title="✅ Mensaje de bienvenida actualizado",
@@ -143,7 +145,7 @@ class Welcome(commands.Cog):
         
         try:
             # Simular evento de bienvenida
-            await self.on_member_join(interaction.user)
+            await self.send_welcome(interaction.user)
             await interaction.followup.send("✅ Mensaje de bienvenida enviado!", ephemeral=True)
         except Exception as e:
             logger.error(f"Error testing welcome: {e}")
@@ -2,13 +2,21 @@ import discord
 from discord.ext import commands
 import asyncio
 import logging
+import random
 import sys
 import os
+import time
+from collections import deque
 
 # Agregar directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config
+from bot.utils.async_database import async_db
+from bot.utils.modlog_writer import modlog_writer
+from bot.utils.message_pipeline import MessagePipeline
+from bot.utils.metrics import metrics
+from bot.utils.rank_cards import rank_cards
 
 # Configurar logging
 logging.basicConfig(
@@ -20,6 +28,170 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Clases de prioridad del planificador, de mayor a menor
+EVENT_PRIORITIES = ('moderation', 'welcome', 'xp', 'presence')
+# Fracción del trabajo de cada clase que se acepta en modo sobrecarga (el resto se descarta)
+OVERLOAD_SAMPLE_RATES = {'xp': config.SCHEDULER_XP_SAMPLE_RATE, 'presence': 0.0}
+# Clases cuyo trabajo en cola se ejecuta antes de apagar (el resto se puede descartar)
+DRAIN_PRIORITIES = ('moderation', 'welcome')
+
+class EventScheduler:
+    """Planificador por prioridades del trabajo que generan los eventos del gateway.
+
+    Cada clase tiene su cola acotada y SCHEDULER_WORKERS tareas toman siempre el
+    trabajo de la clase más prioritaria con pendientes, así que en una avalancha
+    (por ejemplo, un raid) la moderación y la verificación no esperan detrás de
+    bienvenidas o XP. Un monitor mide el retraso del event loop y, si su media
+    pasa de SCHEDULER_LAG_THRESHOLD, entra en modo sobrecarga: la XP se muestrea y la
+    presencia se descarta hasta que el retraso baja a la mitad del umbral.
+    El trabajo de moderación nunca se descarta.
+    """
+
+    def __init__(self, workers: int = config.SCHEDULER_WORKERS, queue_sizes: dict = config.SCHEDULER_QUEUE_SIZES,
+                 lag_threshold: float = config.SCHEDULER_LAG_THRESHOLD,
+                 lag_interval: float = config.SCHEDULER_LAG_INTERVAL):
+        self.workers = workers
+        self.queue_sizes = queue_sizes
+        self.lag_threshold = lag_threshold
+        self.lag_interval = lag_interval
+        self._queues = {priority: deque() for priority in EVENT_PRIORITIES}
+        self._pending_keys = set()  # claves de trabajos en cola que no se repiten
+        self._available = None
+        self._tasks = []
+        self._overflow = set()  # trabajos de moderación lanzados fuera de la cola
+        self._draining = 0  # trabajos de moderación o bienvenida en ejecución
+        self.lag = 0.0
+        self.overloaded = False
+        self.overloads = 0
+        self.processed = dict.fromkeys(EVENT_PRIORITIES, 0)
+        self.shed = dict.fromkeys(EVENT_PRIORITIES, 0)
+
+    def start(self):
+        """Iniciar las tareas y el monitor de retraso (dentro del event loop)"""
+        if self._tasks:
+            return
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._monitor_lag()))
+
+    async def stop(self, drain_timeout: float = config.SCHEDULER_DRAIN_TIMEOUT):
+        """Detener las tareas.
+
+        Antes espera (hasta `drain_timeout` segundos) a que se ejecute el trabajo de
+        moderación y bienvenida en cola y el que está en curso; la XP y la presencia
+        pendientes se descartan. Lo que se descarta se registra por clase.
+        """
+        if self._tasks:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + drain_timeout
+            while (self._draining or self._overflow or any(self._queues[priority] for priority in DRAIN_PRIORITIES)) \
+                    and loop.time() < deadline:
+                await asyncio.sleep(0.05)
+        tasks = self._tasks + list(self._overflow)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        for priority, queue in self._queues.items():
+            if not queue:
+                continue
+            self.shed[priority] += len(queue)
+            metrics.incr(f'scheduler.shed.{priority}.shutdown', len(queue))
+            log = logger.error if priority in DRAIN_PRIORITIES else logger.warning
+            log(f"Event scheduler stopped with {len(queue)} queued {priority} job(s) dropped")
+            queue.clear()
+        self._pending_keys.clear()
+
+    def submit(self, priority: str, name: str, func, *args, key=None) -> bool:
+        """Encolar `func(*args)` en la clase `priority`.
+
+        Con `key`, no se encola si ya hay un trabajo pendiente con la misma clave.
+        Devuelve False si el trabajo se descartó (cola llena o modo sobrecarga).
+        """
+        if key is not None and key in self._pending_keys:
+            return True
+        if self.overloaded and random.random() >= OVERLOAD_SAMPLE_RATES.get(priority, 1.0):
+            return self._shed(priority, 'overload')
+
+        queue = self._queues[priority]
+        if len(queue) >= self.queue_sizes[priority] or self._available is None:
+            if priority == EVENT_PRIORITIES[0] and self._available is not None:
+                # La moderación no se descarta: con la cola llena se ejecuta sin esperar turno
+                task = asyncio.create_task(self._run(priority, name, func, args, time.perf_counter()))
+                self._overflow.add(task)
+                task.add_done_callback(self._overflow.discard)
+                return True
+            return self._shed(priority, 'full')
+
+        queue.append((name, func, args, key, time.perf_counter()))
+        if key is not None:
+            self._pending_keys.add(key)
+        self._available.release()
+        return True
+
+    def _shed(self, priority: str, reason: str) -> bool:
+        self.shed[priority] += 1
+        metrics.incr(f'scheduler.shed.{priority}.{reason}')
+        return False
+
+    async def _worker(self):
+        while True:
+            await self._available.acquire()
+            # Siempre la clase más prioritaria con trabajo pendiente
+            priority = next(priority for priority in EVENT_PRIORITIES if self._queues[priority])
+            name, func, args, key, enqueued = self._queues[priority].popleft()
+            if key is not None:
+                self._pending_keys.discard(key)
+            if priority not in DRAIN_PRIORITIES:
+                await self._run(priority, name, func, args, enqueued)
+                continue
+            self._draining += 1
+            try:
+                await self._run(priority, name, func, args, enqueued)
+            finally:
+                self._draining -= 1
+
+    async def _run(self, priority: str, name: str, func, args, enqueued: float):
+        start = time.perf_counter()
+        metrics.observe('scheduler_wait', priority, start - enqueued)
+        error = False
+        try:
+            await func(*args)
+        except Exception as e:
+            error = True
+            logger.error(f"Error in scheduled job {name}: {e}")
+        finally:
+            self.processed[priority] += 1
+            metrics.observe('scheduler', name, time.perf_counter() - start, error=error)
+
+    async def _monitor_lag(self):
+        """Medir cuánto tarda el event loop en despertar una tarea dormida"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            sample = max(loop.time() - start - self.lag_interval, 0.0)
+            # Media móvil: un pico aislado no activa la sobrecarga, un retraso sostenido sí
+            self.lag = self.lag * 0.7 + sample * 0.3
+            if not self.overloaded and self.lag > self.lag_threshold:
+                self.overloaded = True
+                self.overloads += 1
+                logger.warning(f"Event loop lag {self.lag * 1000:.0f}ms: shedding low-priority work")
+            elif self.overloaded and self.lag < self.lag_threshold / 2:
+                self.overloaded = False
+                logger.info(f"Event loop lag back to {self.lag * 1000:.0f}ms")
+
+    def stats(self) -> dict:
+        """Métricas del planificador"""
+        return {
+            'lag_ms': round(self.lag * 1000, 1),
+            'overloaded': self.overloaded,
+            'overloads': self.overloads,
+            'queued': {priority: len(queue) for priority, queue in self._queues.items()},
+            'processed': dict(self.processed),
+            'shed': dict(self.shed)
+        }
+
 class BotRexy(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
@@ -32,16 +204,26 @@ class BotRexy(commands.Bot):
             intents=intents,
             help_command=None
         )
+        self._warmed_up = False
+        # Etapas de procesamiento de mensajes que registran los cogs (automod, niveles...)
+        self.message_pipeline = MessagePipeline()
+        # Cola por prioridades del trabajo de los eventos (moderación > bienvenida > XP > presencia)
+        self.scheduler = EventScheduler()
     
     async def setup_hook(self):
         """Cargar cogs al iniciar"""
+        modlog_writer.start()
+        self.scheduler.start()
+        metrics.register_gauge('scheduler', self.scheduler.stats)
+        
         cogs = [
             'bot.cogs.moderation',
             'bot.cogs.levels',
             'bot.cogs.welcome',
             'bot.cogs.automod',
             'bot.cogs.game_roles',
-            'bot.cogs.verification'
+            'bot.cogs.verification',
+            'bot.cogs.export'
             
         ]
         
@@ -64,7 +246,16 @@ class BotRexy(commands.Bot):
         logger.info(f'Bot conectado como {self.user} (ID: {self.user.id})')
         logger.info(f'Conectado a {len(self.guilds)} servidor(es)')
         
+        # on_ready se repite en cada reconexión; la precarga solo hace falta una vez
+        if not self._warmed_up:
+            self._warmed_up = True
+            await self.warm_up()
+        
         # Establecer presencia
+        self.scheduler.submit('presence', 'presence', self.update_presence, key='presence')
+    
+    async def update_presence(self):
+        """Mostrar el número de servidores en la presencia del bot"""
         await self.change_presence(
             activity=discord.Activity(
                 type=discord.ActivityType.watching,
@@ -72,29 +263,62 @@ class BotRexy(commands.Bot):
             )
         )
     
+    async def warm_up(self):
+        """Precargar la configuración de todos los servidores en la caché"""
+        start = time.perf_counter()
+        try:
+            stats = await async_db.prefetch_guild_configs([guild.id for guild in self.guilds])
+            elapsed = time.perf_counter() - start
+            logger.info(f"Warm-up de configuración completado en {elapsed:.2f}s: {stats}")
+        except Exception as e:
+            logger.error(f"Error en el warm-up de configuración: {e}")
+    
+    async def on_message(self, message):
+        """Procesar cada mensaje una sola vez: filtros, configuración y etapas de los cogs"""
+        if message.author.bot:
+            return
+        
+        if message.guild is not None:
+            start = time.perf_counter()
+            # Una única lectura de la configuración para todas las etapas: de la caché
+            # sin salir del event loop y, solo si no está, desde el pool de la base de datos
+            settings = async_db.peek_guild_settings(message.guild.id)
+            if settings is None:
+                settings = await async_db.get_guild_settings(message.guild.id)
+            handled = settings is not None and await self.message_pipeline.dispatch(message, settings)
+            metrics.observe('message_pipeline', 'total', time.perf_counter() - start)
+            # Un mensaje eliminado por la automoderación no ejecuta comandos
+            if handled:
+                return
+        
+        await self.process_commands(message)
+    
     async def on_guild_join(self, guild):
         """Evento cuando el bot se une a un servidor"""
         logger.info(f'Bot añadido al servidor: {guild.name} (ID: {guild.id})')
+        await async_db.prefetch_guild_configs([guild.id])
         
         # Actualizar presencia
-        await self.change_presence(
-            activity=discord.Activity(
-                type=discord.ActivityType.watching,
-                name=f"{len(self.guilds)} servidores | /help"
-            )
-        )
+        self.scheduler.submit('presence', 'presence', self.update_presence, key='presence')
     
     async def on_guild_remove(self, guild):
         """Evento cuando el bot es removido de un servidor"""
         logger.info(f'Bot removido del servidor: {guild.name} (ID: {guild.id})')
         
         # Actualizar presencia
-        await self.change_presence(
-            activity=discord.Activity(
-                type=discord.ActivityType.watching,
-                name=f"{len(self.guilds)} servidores | /help"
-            )
-        )
+        self.scheduler.submit('presence', 'presence', self.update_presence, key='presence')
+
+    async def close(self):
+        """Cerrar el bot y liberar recursos"""
+        # main() vuelve a llamar a close() al terminar: los recursos solo se liberan una vez
+        if self.is_closed():
+            return
+        await self.scheduler.stop()
+        await super().close()
+        # Guardar los logs de moderación pendientes antes de cerrar el pool de la base de datos
+        await modlog_writer.stop()
+        async_db.shutdown()
+        rank_cards.shutdown()
 
 # Instancia global del bot
 bot = BotRexy()
@@ -0,0 +1,52 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import config
+from bot.utils.database import db
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabase:
+    """Fachada asíncrona de Database para usar desde el event loop del bot.
+
+    Expone los mismos métodos que Database, pero cada llamada se ejecuta en un
+    pool de hilos acotado, de modo que una consulta lenta a Supabase no congela
+    el gateway (heartbeats y eventos del resto de servidores).
+    """
+
+    # Métodos puros (sin I/O) que se devuelven tal cual, sin pasar por el pool
+    SYNC_METHODS = frozenset({'xp_for_level', 'config_version', 'peek_guild_settings'})
+
+    def __init__(self, database, max_workers: int):
+        self._db = database
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        attr = getattr(self._db, name)
+        if name in self.SYNC_METHODS or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        # Guardar el wrapper para no pasar de nuevo por __getattr__
+        setattr(self, name, wrapper)
+        return wrapper
+
+    async def run(self, func, *args, **kwargs):
+        """Ejecutar una función bloqueante en el pool de la base de datos"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        """Esperar a las consultas en curso y cerrar el pool"""
+        self._executor.shutdown(wait=True)
+        logger.info("Database executor shut down")
+
+# Instancia global
+async_db = AsyncDatabase(db, config.DB_MAX_WORKERS)
@@ -0,0 +1,102 @@
+import abc
+import re
+import time
+from bot.utils.metrics import metrics
+
+# Emojis personalizados: <:nombre:id> o <a:nombre:id>
+CUSTOM_EMOJI = re.compile(r'<a?:\w+:\d+>')
+
+# Coste de cada tipo de regla: primero conteos, luego búsquedas de subcadenas y al final regex
+COST_COUNT = 0
+COST_SUBSTRING = 1
+COST_REGEX = 2
+
+class AutomodRule(abc.ABC):
+    """Regla de automoderación: `check` devuelve el motivo si el mensaje la incumple"""
+
+    name = None
+    cost = COST_COUNT
+
+    @abc.abstractmethod
+    def check(self, message, content: str, lowered: str):
+        """Motivo de la infracción, o None si el mensaje cumple la regla"""
+
+class MentionsRule(AutomodRule):
+    name = 'mentions'
+    cost = COST_COUNT
+
+    def __init__(self, max_mentions: int):
+        self.max_mentions = max_mentions
+        self.reason = f"Demasiadas menciones (máximo {max_mentions})"
+
+    def check(self, message, content, lowered):
+        if len(message.mentions) > self.max_mentions:
+            return self.reason
+        return None
+
+class SubstringRule(AutomodRule):
+    """Incumplida si el contenido en minúsculas contiene alguno de los textos"""
+    cost = COST_SUBSTRING
+
+    def __init__(self, name: str, needles, reason: str):
+        self.name = name
+        self.needles = tuple(needles)
+        self.reason = reason
+
+    def check(self, message, content, lowered):
+        for needle in self.needles:
+            if needle in lowered:
+                return self.reason
+        return None
+
+class EmojisRule(AutomodRule):
+    name = 'emojis'
+    cost = COST_REGEX
+
+    def __init__(self, max_emojis: int):
+        self.max_emojis = max_emojis
+        self.reason = f"Demasiados emojis (máximo {max_emojis})"
+
+    def check(self, message, content, lowered):
+        # Cada emoji personalizado lleva dos ':': si no caben max_emojis + 1, no hace falta la regex
+        if content.count(':') < 2 * (self.max_emojis + 1):
+            return None
+        if len(CUSTOM_EMOJI.findall(content)) > self.max_emojis:
+            return self.reason
+        return None
+
+class CompiledAutomod:
+    """Reglas de automoderación de un servidor, construidas una vez por versión de su configuración.
+
+    Las reglas se evalúan de la más barata a la más cara y la primera que se
+    incumple corta la evaluación. Cada regla registra su tiempo y sus aciertos.
+    """
+
+    def __init__(self, settings, version: int):
+        self.source = settings  # AutomodSettings de la que se construyó
+        self.version = version
+        rules = [MentionsRule(settings.max_mentions), EmojisRule(settings.max_emojis)]
+        if settings.anti_invites:
+            rules.append(SubstringRule('invites', ('discord.gg/', 'discordapp.com/invite/'),
+                                       "Invitaciones de Discord no permitidas"))
+        if settings.anti_links:
+            rules.append(SubstringRule('links', ('http://', 'https://', 'www.'), "Enlaces no permitidos"))
+        # Palabras en minúsculas y sin repetir, preparadas una sola vez
+        bad_words = tuple(dict.fromkeys(word.lower() for word in settings.bad_words if word))
+        if bad_words:
+            rules.append(SubstringRule('bad_words', bad_words, "Lenguaje inapropiado"))
+        # Orden estable por coste y, dentro de las subcadenas, por número de textos
+        self.rules = sorted(rules, key=lambda rule: (rule.cost, len(getattr(rule, 'needles', ()))))
+
+    def check(self, message):
+        """Motivo de la primera regla incumplida, o None"""
+        content = message.content
+        lowered = content.lower()
+        for rule in self.rules:
+            start = time.perf_counter()
+            reason = rule.check(message, content, lowered)
+            metrics.observe('automod_rules', rule.name, time.perf_counter() - start)
+            if reason is not None:
+                metrics.incr(f'automod.hits.{rule.name}')
+                return reason
+        return None
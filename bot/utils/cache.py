@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class TTLCache:
+    """Caché LRU acotada con expiración por tiempo y versión por clave.
+
+    Es segura entre hilos: la comparten el bot (pool de la base de datos) y el
+    panel web. Cada invalidación incrementa la versión de la clave, de modo que
+    una lectura que empezó antes de invalidar no puede guardar datos viejos.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # {key: (expires_at, value)}
+        self._versions = {}  # {key: version}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def get(self, key, default=None):
+        """Obtener un valor vigente o `default`"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def get_stale(self, key, default=None):
+        """Obtener el último valor guardado aunque haya expirado (para cuando la base de datos falla)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            self.stale_hits += 1
+            return item[1]
+
+    def version(self, key) -> int:
+        """Versión actual de una clave (se lee antes de cargar el valor)"""
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def set(self, key, value, version: int = None):
+        """Guardar un valor; se descarta si la clave se invalidó desde `version`"""
+        with self._lock:
+            if version is not None and version != self._versions.get(key, 0):
+                return False
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key):
+        """Eliminar una clave e incrementar su versión"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            for key in self._data:
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'stale_hits': self.stale_hits,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución.
+
+    El primer hilo que pide una clave ejecuta la función; los que llegan
+    mientras está en curso esperan y reciben el mismo resultado (o excepción).
+    """
+
+    def __init__(self):
+        self._calls = {}  # {key: Future}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """Ejecutar `func` una sola vez para todas las llamadas simultáneas con `key`"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'shared': self.shared
+            }
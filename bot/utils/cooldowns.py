@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+
+class CooldownStore:
+    """Cooldowns por (guild_id, user_id) con caducidad automática.
+
+    Todas las entradas duran lo mismo, así que el orden de inserción es también
+    el de caducidad: cada consulta retira del principio las que ya vencieron y la
+    memoria queda acotada a los usuarios activos en los últimos `duration` segundos.
+    """
+
+    def __init__(self, duration: float):
+        self.duration = duration
+        self._expires = OrderedDict()  # {(guild_id, user_id): instante monotónico de fin}
+        self.limited = 0
+        self.expired = 0
+
+    def _sweep(self, now: float):
+        """Retirar los cooldowns vencidos (están todos al principio)"""
+        expires = self._expires
+        while expires:
+            key, expires_at = next(iter(expires.items()))
+            if expires_at > now:
+                break
+            del expires[key]
+            self.expired += 1
+
+    def try_acquire(self, guild_id: int, user_id: int) -> bool:
+        """Iniciar el cooldown del usuario en el servidor, o False si ya tiene uno activo"""
+        now = time.monotonic()
+        self._sweep(now)
+        key = (guild_id, user_id)
+        if key in self._expires:
+            self.limited += 1
+            return False
+        self._expires[key] = now + self.duration
+        return True
+
+    def remaining(self, guild_id: int, user_id: int) -> float:
+        """Segundos que le quedan al cooldown (0 si no tiene)"""
+        expires_at = self._expires.get((guild_id, user_id))
+        if expires_at is None:
+            return 0.0
+        return max(expires_at - time.monotonic(), 0.0)
+
+    def clear(self, guild_id: int, user_id: int):
+        self._expires.pop((guild_id, user_id), None)
+
+    def __len__(self):
+        return len(self._expires)
+
+    def stats(self) -> dict:
+        """Métricas del almacén"""
+        # Sin barrido: el panel web lo lee desde otro hilo
+        return {
+            'size': len(self._expires),
+            'limited': self.limited,
+            'expired': self.expired
+        }
@@ -1,9 +1,61 @@
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from bot.utils.cache import TTLCache, SingleFlight
+from bot.utils.settings import GuildSettings
+from bot.utils.leaderboard import leaderboards
+from bot.utils.pagination import encode_cursor, decode_cursor
+from bot.utils.level_curve import default_curve
+from bot.utils.sqlite_client import SQLiteClient
+from bot.utils.metrics import metrics, count_rows
+from bot.utils.resilience import CircuitBreaker, CircuitOpenError, backoff_delay
 import config
+import copy
 import logging
+import re
+import sqlite3
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Acciones que se registran en moderation_logs (filtro de /modlogs y del panel)
+MODERATION_ACTIONS = ('ban', 'unban', 'kick', 'timeout', 'untimeout', 'warn', 'clear', 'message_delete')
+
+# Formato de created_at aceptado en los cursores de moderation_logs (va dentro de un filtro or)
+CURSOR_TIMESTAMP = re.compile(r'^[0-9T:.+\- Z]+$')
+
+# Tablas que forman parte de la instantánea GuildSettings
+SETTINGS_TABLES = ('guilds', 'automod_config', 'welcome_config', 'verification_config')
+
+# Métodos que no se miden: no hacen consultas o son generadores (sus consultas se miden por endpoint)
+UNTIMED_METHODS = frozenset({
+    'xp_for_level', 'invalidate_config', 'config_version', 'peek_guild_settings', 'breaker_stats', 'iter_user_pages',
+    'iter_moderation_log_pages'
+})
+
+# Clases de SQLSTATE transitorias: conexión, conflicto de concurrencia, recursos, cancelación (timeout) y sistema
+TRANSIENT_SQLSTATE_CLASSES = ('08', '40', '53', '57', '58', 'XX')
+
+def _is_client_error(error: Exception) -> bool:
+    """Indicar si un error es de la propia petición (4xx, restricción, filtro mal formado).
+    
+    Repetirla daría el mismo error y el endpoint sí respondió, así que no se
+    reintenta ni cuenta como fallo para su circuit breaker.
+    """
+    if isinstance(error, APIError):
+        code = str(error.code or '')
+        if code.isdigit() and len(code) == 3:
+            # Respuesta sin JSON: el código es el estado HTTP
+            return code.startswith('4') and code not in ('408', '429')
+        if code.startswith('PGRST'):
+            # PGRST0xx son errores de conexión de PostgREST con la base de datos (503)
+            return not code.startswith('PGRST0')
+        if len(code) == 5:
+            return code[:2] not in TRANSIENT_SQLSTATE_CLASSES
+        return False
+    # Backend SQLite: restricciones, SQL o identificadores no válidos
+    return isinstance(error, (sqlite3.IntegrityError, sqlite3.ProgrammingError, ValueError))
+
 class Database:
     _instance = None
 
@@ -15,40 +67,241 @@ class Database:
     def __init__(self):
         if not hasattr(self, 'client'):
             try:
-                # Crear cliente sin opciones adicionales para evitar problemas de compatibilidad
-                self.client: Client = create_client(
-                    supabase_url=config.SUPABASE_URL,
-                    supabase_key=config.SUPABASE_KEY
-                )
+                if config.DATABASE_BACKEND == 'sqlite':
+                    # Backend local con la misma interfaz que el cliente de Supabase
+                    self.client = SQLiteClient(config.SQLITE_PATH)
+                else:
+                    # Crear cliente sin opciones adicionales para evitar problemas de compatibilidad
+                    self.client: Client = create_client(
+                        supabase_url=config.SUPABASE_URL,
+                        supabase_key=config.SUPABASE_KEY
+                    )
             except Exception as e:
-                logger.error(f"Error initializing Supabase client: {e}")
+                logger.error(f"Error initializing {config.DATABASE_BACKEND} client: {e}")
                 raise
+            
+            # Caché de filas de configuración por servidor: {(tabla, guild_id): fila}
+            self.config_cache = TTLCache(maxsize=config.CONFIG_CACHE_SIZE, ttl=config.CONFIG_CACHE_TTL)
+            # Consultas en curso compartidas entre hilos: {(tabla, guild_id[, user_id]): Future}
+            self.flights = SingleFlight()
+            # Circuit breakers por tabla/RPC: {endpoint: CircuitBreaker}
+            self.breakers = {}
+            self._breakers_lock = threading.Lock()
+    
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self.breakers.setdefault(
+                    endpoint, CircuitBreaker(config.DB_BREAKER_FAILURES, config.DB_BREAKER_RESET)
+                )
+        return breaker
+    
+    def _execute(self, query, endpoint: str, idempotent: bool = False):
+        """Ejecutar una consulta registrando latencia, errores y filas por tabla/RPC.
+        
+        Si el circuito del endpoint está abierto falla al momento con CircuitOpenError.
+        Las consultas idempotentes (lecturas) se reintentan con backoff y jitter.
+        Solo los errores de red, timeouts y 5xx cuentan como fallos del circuito y se
+        reintentan; los errores de la petición (4xx, restricciones) se lanzan al momento.
+        """
+        breaker = self._breaker(endpoint)
+        attempts = config.DB_READ_RETRIES + 1 if idempotent else 1
+        
+        for attempt in range(attempts):
+            if not breaker.allow():
+                metrics.incr('db.circuit_rejected')
+                raise CircuitOpenError(endpoint)
+            
+            start = time.perf_counter()
+            try:
+                response = query.execute()
+            except Exception as e:
+                metrics.observe('db.endpoint', endpoint, time.perf_counter() - start, error=True)
+                if _is_client_error(e):
+                    # El endpoint respondió: el fallo es de esta petición, no del servicio
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt + 1 == attempts:
+                    raise
+                metrics.incr('db.retries')
+                time.sleep(backoff_delay(attempt, config.DB_RETRY_BASE_DELAY, config.DB_RETRY_MAX_DELAY))
+                continue
+            
+            breaker.record_success()
+            metrics.observe('db.endpoint', endpoint, time.perf_counter() - start, count_rows(response.data))
+            return response
+    
+    def breaker_stats(self) -> dict:
+        """Estado de los circuit breakers por endpoint"""
+        with self._breakers_lock:
+            breakers = sorted(self.breakers.items())
+        return {endpoint: breaker.stats() for endpoint, breaker in breakers}
+    
+    # Config Cache
+    def _get_cached_config(self, table: str, guild_id: int, loader):
+        """Obtener una fila de configuración desde la caché o cargarla con `loader`"""
+        key = (table, str(guild_id))
+        row = self.config_cache.get(key)
+        if row is None:
+            # Las lecturas simultáneas del mismo servidor comparten una sola consulta
+            # (y un solo INSERT si la fila todavía no existe)
+            row = self.flights.do(key, self._load_config, key, loader, guild_id)
+            if row is None:
+                return None
+        # Copia para que quien la use no modifique la fila cacheada
+        return copy.deepcopy(row)
+    
+    def _load_config(self, key, loader, guild_id: int):
+        version = self.config_cache.version(key)
+        row = loader(guild_id)
+        if row is None:
+            # Base de datos caída o circuito abierto: seguir con el último valor conocido
+            stale = self.config_cache.get_stale(key)
+            if stale is not None:
+                logger.warning(f"Serving stale {key[0]} for guild {guild_id}")
+            return stale
+        self.config_cache.set(key, row, version)
+        return row
+    
+    def _get_or_create(self, table: str, key: dict, defaults: dict):
+        """Obtener una fila o crearla con `defaults` en una sola petición (RPC get_or_create_row)"""
+        response = self._execute(self.client.rpc('get_or_create_row', {
+            'p_table': table,
+            'p_key': key,
+            'p_defaults': defaults
+        }), 'rpc.get_or_create_row', idempotent=True)
+        if response.data:
+            return response.data
+        
+        # Otra transacción creó la fila a la vez que nosotros: leerla
+        query = self.client.table(table).select('*')
+        for column, value in key.items():
+            query = query.eq(column, value)
+        response = self._execute(query, table, idempotent=True)
+        return response.data[0] if response.data else None
+    
+    def prefetch_guild_configs(self, guild_ids, chunk_size: int = None) -> dict:
+        """Precargar en la caché la configuración de muchos servidores con consultas por lotes"""
+        chunk_size = chunk_size or config.WARMUP_CHUNK_SIZE
+        guild_ids = [str(guild_id) for guild_id in guild_ids]
+        settings_versions = {guild_id: self.config_cache.version(('settings', guild_id)) for guild_id in guild_ids}
+        loaded_rows = {}  # {tabla: {guild_id: fila}}
+        defaults = {
+            'guilds': self._default_guild_config,
+            'automod_config': self._default_automod_config,
+            'welcome_config': self._default_welcome_config,
+            'verification_config': self._default_verification_config
+        }
+        stats = {}
+        
+        for table, default in defaults.items():
+            loaded = created = 0
+            try:
+                for i in range(0, len(guild_ids), chunk_size):
+                    chunk = guild_ids[i:i + chunk_size]
+                    versions = {guild_id: self.config_cache.version((table, guild_id)) for guild_id in chunk}
+                    
+                    response = self._execute(self.client.table(table).select('*').in_('guild_id', chunk), table, idempotent=True)
+                    rows = {row['guild_id']: row for row in response.data or []}
+                    
+                    # Crear de una vez las filas por defecto que falten
+                    missing = [default(guild_id) for guild_id in chunk if guild_id not in rows]
+                    if missing:
+                        response = self._execute(self.client.table(table).upsert(missing, on_conflict='guild_id', ignore_duplicates=True), table)
+                        for row in response.data or []:
+                            rows[row['guild_id']] = row
+                            created += 1
+                    
+                    for guild_id, row in rows.items():
+                        self.config_cache.set((table, guild_id), row, versions[guild_id])
+                    loaded += len(rows)
+                    loaded_rows.setdefault(table, {}).update(rows)
+            except Exception as e:
+                logger.error(f"Error prefetching {table}: {e}")
+            stats[table] = {'loaded': loaded, 'created': created}
+        
+        # Construir las instantáneas de los servidores con todas sus filas cargadas
+        primed = 0
+        for guild_id in guild_ids:
+            rows = [loaded_rows.get(table, {}).get(guild_id) for table in SETTINGS_TABLES]
+            if all(rows):
+                self.config_cache.set(('settings', guild_id), GuildSettings.from_rows(*rows), settings_versions[guild_id])
+                primed += 1
+        stats['settings'] = {'loaded': primed}
+        
+        return stats
+    
+    def invalidate_config(self, table: str, guild_id: int):
+        """Descartar la fila cacheada de una tabla de configuración"""
+        self.config_cache.invalidate((table, str(guild_id)))
+        if table in SETTINGS_TABLES:
+            self.config_cache.invalidate(('settings', str(guild_id)))
+    
+    def config_version(self, table: str, guild_id: int) -> int:
+        """Versión de la configuración de una tabla (cambia con cada actualización)"""
+        return self.config_cache.version((table, str(guild_id)))
+    
+    # Guild Settings
+    def get_guild_settings(self, guild_id: int):
+        """Obtener toda la configuración de un servidor (GuildSettings) en una sola petición"""
+        key = ('settings', str(guild_id))
+        settings = self.config_cache.get(key)
+        if settings is None:
+            # GuildSettings es inmutable: se comparte sin copiar
+            settings = self.flights.do(key, self._load_config, key, self._fetch_guild_settings, guild_id)
+        return settings
+    
+    def peek_guild_settings(self, guild_id: int):
+        """Configuración de un servidor si está en la caché, o None (sin consultar la base de datos)"""
+        return self.config_cache.get(('settings', str(guild_id)))
+    
+    def _fetch_guild_settings(self, guild_id: int):
+        try:
+            response = self._execute(self.client.rpc('get_guild_settings', {'p_guild_id': str(guild_id)}), 'rpc.get_guild_settings', idempotent=True)
+            rows = response.data or {}
+            
+            # Servidor nuevo: crear solo las filas que falten
+            guild = rows.get('guild') or self.get_guild_config(guild_id)
+            automod = rows.get('automod') or self.get_automod_config(guild_id)
+            welcome = rows.get('welcome') or self.get_welcome_config(guild_id)
+            verification = rows.get('verification') or self.get_verification_config(guild_id)
+            if not guild:
+                return None
+            
+            return GuildSettings.from_rows(guild, automod or {}, welcome or {}, verification or {})
+        except Exception as e:
+            logger.error(f"Error getting guild settings: {e}")
+            return None
     
     # Guild Management
     def get_guild_config(self, guild_id: int):
         """Obtener configuración de un servidor"""
+        return self._get_cached_config('guilds', guild_id, self._fetch_guild_config)
+    
+    def _fetch_guild_config(self, guild_id: int):
         try:
-            response = self.client.table('guilds').select('*').eq('guild_id', str(guild_id)).execute()
-            if response.data:
-                return response.data[0]
-            else:
-                # Crear configuración por defecto
-                return self.create_guild_config(guild_id)
+            return self._get_or_create('guilds', {'guild_id': str(guild_id)}, self._default_guild_config(guild_id))
         except Exception as e:
             logger.error(f"Error getting guild config: {e}")
             return None
     
+    def _default_guild_config(self, guild_id: int) -> dict:
+        """Valores por defecto de guilds"""
+        return {
+            'guild_id': str(guild_id),
+            'prefix': config.BOT_PREFIX,
+            'automod_enabled': True,
+            'levels_enabled': True,
+            'welcome_enabled': False
+        }
+    
     def create_guild_config(self, guild_id: int):
         """Crear configuración por defecto para un servidor"""
         try:
-            data = {
-                'guild_id': str(guild_id),
-                'prefix': config.BOT_PREFIX,
-                'automod_enabled': True,
-                'levels_enabled': True,
-                'welcome_enabled': False
-            }
-            response = self.client.table('guilds').insert(data).execute()
+            data = self._default_guild_config(guild_id)
+            response = self._execute(self.client.table('guilds').insert(data), 'guilds')
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error creating guild config: {e}")
@@ -57,7 +310,8 @@ class Database:
     def update_guild_config(self, guild_id: int, **kwargs):
         """Actualizar configuración de un servidor"""
         try:
-            response = self.client.table('guilds').update(kwargs).eq('guild_id', str(guild_id)).execute()
+            response = self._execute(self.client.table('guilds').update(kwargs).eq('guild_id', str(guild_id)), 'guilds')
+            self.invalidate_config('guilds', guild_id)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating guild config: {e}")
@@ -66,18 +320,66 @@ class Database:
     # User Levels
     def get_user_level(self, guild_id: int, user_id: int):
         """Obtener nivel y XP de un usuario"""
+        row = self.flights.do(('users', str(guild_id), str(user_id)), self._fetch_user_level, guild_id, user_id)
+        return dict(row) if row else row
+    
+    def _fetch_user_level(self, guild_id: int, user_id: int):
         try:
-            response = self.client.table('users').select('*').eq('guild_id', str(guild_id)).eq('user_id', str(user_id)).execute()
-            if response.data:
-                return response.data[0]
-            else:
-                return self.create_user(guild_id, user_id)
+            key = {'guild_id': str(guild_id), 'user_id': str(user_id)}
+            return self._get_or_create('users', key, self._default_user(guild_id, user_id))
         except Exception as e:
             logger.error(f"Error getting user level: {e}")
             return None
     
+    def _default_user(self, guild_id: int, user_id: int) -> dict:
+        """Valores por defecto de users"""
+        return {
+            'guild_id': str(guild_id),
+            'user_id': str(user_id),
+            'xp': 0,
+            'level': 0,
+            'messages': 0
+        }
+    
     def create_user(self, guild_id: int, user_id: int):
         """Crear registro de usuario"""
+        try:
+            data = self._default_user(guild_id, user_id)
+            response = self._execute(self.client.table('users').insert(data), 'users')
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error creating user: {e}")
+            return None
+    
+    def increment_users_xp(self, rows: list):
+        """Sumar en bloque y de forma atómica XP y mensajes a varios usuarios (RPC increment_users_xp).
+        
+        Cada fila lleva guild_id, user_id, los incrementos xp y messages y la curva
+        (curve, multiplier) con la que se recalcula su nivel. Devuelve los totales
+        guardados de cada usuario.
+        """
+        # No toca la clasificación en memoria: XPLedger ya la actualiza con cada cambio
+        try:
+            response = self._execute(self.client.rpc('increment_users_xp', {'p_rows': rows}), 'rpc.increment_users_xp')
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Error incrementing users XP: {e}")
+            return None
+    
+    def import_users(self, guild_id: int, rows: list):
+        """Guardar en bloque usuarios importados y reflejarlos en la clasificación en memoria"""
+        try:
+            response = self._execute(self.client.table('users').upsert(rows, on_conflict='guild_id,user_id'), 'users')
+            # Las filas devueltas traen los mensajes guardados aunque el archivo no los incluyera
+            for row in response.data:
+                leaderboards.update(guild_id, row['user_id'], row['xp'], row['level'], row['messages'])
+            return response.data
+        except Exception as e:
+            logger.error(f"Error importing users: {e}")
+            return None
+    
+    def reset_user(self, guild_id: int, user_id: int):
+        """Resetear XP, nivel y mensajes de un usuario"""
         try:
             data = {
                 'guild_id': str(guild_id),
@@ -86,82 +388,152 @@ class Database:
                 'level': 0,
                 'messages': 0
             }
-            response = self.client.table('users').insert(data).execute()
+            response = self._execute(self.client.table('users').upsert(data, on_conflict='guild_id,user_id'), 'users')
+            leaderboards.update(guild_id, user_id, 0, 0, 0)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating user: {e}")
+            logger.error(f"Error resetting user: {e}")
             return None
     
-    def add_xp(self, guild_id: int, user_id: int, xp: int):
-        """Agregar XP a un usuario"""
+    def xp_for_level(self, level: int) -> int:
+        """Calcular XP necesaria para un nivel con la curva por defecto"""
+        return default_curve.xp_for_level(level)
+    
+    def get_level_curve(self, guild_id: int):
+        """Curva de niveles de un servidor (la de por defecto si no se puede leer su configuración)"""
+        settings = self.get_guild_settings(guild_id)
+        return settings.curve if settings else default_curve
+    
+    def recompute_levels(self, guild_id: int, curve=None, chunk_size: int = None):
+        """Recalcular el nivel de todos los usuarios de un servidor con su curva.
+        
+        Recorre los usuarios por bloques, calcula los niveles de cada bloque de una
+        vez (con numpy si está instalado) y guarda solo las filas cuyo nivel cambia,
+        en un upsert por bloque que solo escribe la columna level.
+        """
+        curve = curve or self.get_level_curve(guild_id)
+        stats = {'scanned': 0, 'changed': 0, 'chunks': 0}
         try:
-            user = self.get_user_level(guild_id, user_id)
-            if not user:
-                return None
-            
-            new_xp = user['xp'] + xp
-            new_level = user['level']
-            new_messages = user['messages'] + 1
-            
-            # Calcular nuevo nivel
-            xp_needed = self.xp_for_level(new_level + 1)
-            leveled_up = False
-            
-            while new_xp >= xp_needed:
-                new_level += 1
-                leveled_up = True
-                xp_needed = self.xp_for_level(new_level + 1)
-            
-            response = self.client.table('users').update({
-                'xp': new_xp,
-                'level': new_level,
-                'messages': new_messages
-            }).eq('guild_id', str(guild_id)).eq('user_id', str(user_id)).execute()
-            
-            return {'leveled_up': leveled_up, 'new_level': new_level, 'data': response.data[0] if response.data else None}
+            for page in self.iter_user_pages(guild_id, chunk_size or config.LEVEL_RECOMPUTE_CHUNK):
+                changed = curve.changed_levels([row['xp'] for row in page], [row['level'] for row in page])
+                if changed:
+                    rows = [
+                        {'guild_id': str(guild_id), 'user_id': page[index]['user_id'], 'level': level}
+                        for index, level in changed
+                    ]
+                    self._execute(self.client.table('users').upsert(rows, on_conflict='guild_id,user_id'), 'users')
+                    for index, level in changed:
+                        row = page[index]
+                        leaderboards.update(guild_id, row['user_id'], row['xp'], level, row['messages'])
+                stats['scanned'] += len(page)
+                stats['changed'] += len(changed)
+                stats['chunks'] += 1
+            return stats
         except Exception as e:
-            logger.error(f"Error adding XP: {e}")
+            logger.error(f"Error recomputing levels: {e} ({stats})")
             return None
     
-    def xp_for_level(self, level: int) -> int:
-        """Calcular XP necesaria para un nivel"""
-        return config.LEVEL_MULTIPLIER * (level ** 2)
+    def iter_user_pages(self, guild_id, page_size: int):
+        """Recorrer los usuarios de un servidor por páginas (keyset sobre user_id)"""
+        last_user_id = None
+        while True:
+            query = self.client.table('users').select('user_id,xp,level,messages').eq('guild_id', str(guild_id))
+            if last_user_id is not None:
+                query = query.gt('user_id', last_user_id)
+            response = self._execute(query.order('user_id').limit(page_size), 'users', idempotent=True)
+            page = response.data or []
+            # Hasta una página vacía: el servidor puede devolver menos filas que page_size (max-rows)
+            if not page:
+                return
+            yield page
+            last_user_id = page[-1]['user_id']
     
-    def get_leaderboard(self, guild_id: int, limit: int = 10):
-        """Obtener tabla de clasificación"""
+    def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0):
+        """Obtener tabla de clasificación (desde la clasificación en memoria)"""
         try:
-            response = self.client.table('users').select('*').eq('guild_id', str(guild_id)).order('level', desc=True).order('xp', desc=True).limit(limit).execute()
-            return response.data
+            return self._leaderboard(guild_id).top(limit, offset)
         except Exception as e:
             logger.error(f"Error getting leaderboard: {e}")
             return []
     
+    def get_leaderboard_page(self, guild_id: int, limit: int = 10, cursor: str = None):
+        """Obtener una página del ranking a partir del cursor de la página anterior.
+        
+        Devuelve {'items', 'next_cursor', 'offset'}; ValueError si el cursor no es válido.
+        """
+        after = decode_cursor(cursor, 3) if cursor else None
+        if after and not all(isinstance(value, int) for value in after[:2]):
+            raise ValueError(f"Cursor no válido: {cursor!r}")
+        try:
+            board = self._leaderboard(guild_id)
+            if after:
+                level, xp, user_id = after
+                offset, rows = board.page_after(level, xp, str(user_id), limit + 1)
+            else:
+                offset, rows = 0, board.top(limit + 1)
+            
+            next_cursor = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_cursor = encode_cursor([last['level'], last['xp'], last['user_id']])
+            return {'items': rows[:limit], 'next_cursor': next_cursor, 'offset': offset}
+        except Exception as e:
+            logger.error(f"Error getting leaderboard page: {e}")
+            return {'items': [], 'next_cursor': None, 'offset': 0}
+    
+    def get_user_rank(self, guild_id: int, user_id: int, neighbors: int = 1):
+        """Obtener la posición de un usuario en la clasificación y quién está justo por encima y por debajo"""
+        try:
+            return self._leaderboard(guild_id).rank(str(user_id), neighbors)
+        except Exception as e:
+            logger.error(f"Error getting user rank: {e}")
+            return None
+    
+    def _leaderboard(self, guild_id: int):
+        """Clasificación en memoria de un servidor, cargándola de la base de datos la primera vez"""
+        board = leaderboards.board(guild_id)
+        if not board.seeded:
+            self.flights.do(('leaderboard', str(guild_id)), self._seed_leaderboard, board)
+        return board
+    
+    def _seed_leaderboard(self, board):
+        if board.seeded:
+            return
+        rows = []
+        for page in self.iter_user_pages(board.guild_id, config.LEADERBOARD_SEED_PAGE):
+            rows.extend(page)
+        board.seed(rows)
+        logger.info(f"Loaded leaderboard for guild {board.guild_id} ({len(rows)} users)")
+    
     # Welcome Configuration
     def get_welcome_config(self, guild_id: int):
         """Obtener configuración de bienvenida"""
+        return self._get_cached_config('welcome_config', guild_id, self._fetch_welcome_config)
+    
+    def _fetch_welcome_config(self, guild_id: int):
         try:
-            response = self.client.table('welcome_config').select('*').eq('guild_id', str(guild_id)).execute()
-            if response.data:
-                return response.data[0]
-            else:
-                return self.create_welcome_config(guild_id)
+            return self._get_or_create('welcome_config', {'guild_id': str(guild_id)}, self._default_welcome_config(guild_id))
         except Exception as e:
             logger.error(f"Error getting welcome config: {e}")
             return None
     
+    def _default_welcome_config(self, guild_id: int) -> dict:
+        """Valores por defecto de welcome_config"""
+        return {
+            'guild_id': str(guild_id),
+            'channel_id': None,
+            'message': '¡Bienvenido {user} a {server}!',
+            'image_enabled': True,
+            'image_background': '#7289da',
+            'image_text_color': '#ffffff',
+            'background_image_url': None
+        }
+    
     def create_welcome_config(self, guild_id: int):
         """Crear configuración de bienvenida por defecto"""
         try:
-            data = {
-                'guild_id': str(guild_id),
-                'channel_id': None,
-                'message': '¡Bienvenido {user} a {server}!',
-                'image_enabled': True,
-                'image_background': '#7289da',
-                'image_text_color': '#ffffff',
-                'background_image_url': None
-            }
-            response = self.client.table('welcome_config').insert(data).execute()
+            data = self._default_welcome_config(guild_id)
+            response = self._execute(self.client.table('welcome_config').insert(data), 'welcome_config')
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error creating welcome config: {e}")
@@ -170,7 +542,8 @@ class Database:
     def update_welcome_config(self, guild_id: int, **kwargs):
         """Actualizar configuración de bienvenida"""
         try:
-            response = self.client.table('welcome_config').update(kwargs).eq('guild_id', str(guild_id)).execute()
+            response = self._execute(self.client.table('welcome_config').update(kwargs).eq('guild_id', str(guild_id)), 'welcome_config')
+            self.invalidate_config('welcome_config', guild_id)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating welcome config: {e}")
@@ -179,29 +552,32 @@ class Database:
     # Automod Configuration
     def get_automod_config(self, guild_id: int):
         """Obtener configuración de automoderación"""
+        return self._get_cached_config('automod_config', guild_id, self._fetch_automod_config)
+    
+    def _fetch_automod_config(self, guild_id: int):
         try:
-            response = self.client.table('automod_config').select('*').eq('guild_id', str(guild_id)).execute()
-            if response.data:
-                return response.data[0]
-            else:
-                return self.create_automod_config(guild_id)
+            return self._get_or_create('automod_config', {'guild_id': str(guild_id)}, self._default_automod_config(guild_id))
         except Exception as e:
             logger.error(f"Error getting automod config: {e}")
             return None
     
+    def _default_automod_config(self, guild_id: int) -> dict:
+        """Valores por defecto de automod_config"""
+        return {
+            'guild_id': str(guild_id),
+            'anti_spam': True,
+            'anti_links': False,
+            'anti_invites': True,
+            'bad_words': [],
+            'max_mentions': config.MAX_MENTIONS,
+            'max_emojis': config.MAX_EMOJIS
+        }
+    
     def create_automod_config(self, guild_id: int):
         """Crear configuración de automoderación por defecto"""
         try:
-            data = {
-                'guild_id': str(guild_id),
-                'anti_spam': True,
-                'anti_links': False,
-                'anti_invites': True,
-                'bad_words': [],
-                'max_mentions': config.MAX_MENTIONS,
-                'max_emojis': config.MAX_EMOJIS
-            }
-            response = self.client.table('automod_config').insert(data).execute()
+            data = self._default_automod_config(guild_id)
+            response = self._execute(self.client.table('automod_config').insert(data), 'automod_config')
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error creating automod config: {e}")
@@ -210,7 +586,8 @@ class Database:
     def update_automod_config(self, guild_id: int, **kwargs):
         """Actualizar configuración de automoderación"""
         try:
-            response = self.client.table('automod_config').update(kwargs).eq('guild_id', str(guild_id)).execute()
+            response = self._execute(self.client.table('automod_config').update(kwargs).eq('guild_id', str(guild_id)), 'automod_config')
+            self.invalidate_config('automod_config', guild_id)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating automod config: {e}")
@@ -227,45 +604,123 @@ class Database:
                 'action': action,
                 'reason': reason
             }
-            response = self.client.table('moderation_logs').insert(data).execute()
+            response = self._execute(self.client.table('moderation_logs').insert(data), 'moderation_logs')
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error logging moderation: {e}")
             return None
     
-    def get_moderation_logs(self, guild_id: int, limit: int = 50):
-        """Obtener logs de moderación"""
+    def log_moderation_bulk(self, entries: list):
+        """Registrar varias acciones de moderación en un solo INSERT"""
+        try:
+            response = self._execute(self.client.table('moderation_logs').insert(entries), 'moderation_logs')
+            return response.data
+        except Exception as e:
+            logger.error(f"Error logging moderation batch: {e}")
+            return None
+    
+    def _moderation_logs_query(self, guild_id: int, user_id: int = None, moderator_id: int = None,
+                               action: str = None, since=None, until=None):
+        """Consulta de logs de un servidor con filtros opcionales (`since`/`until` son datetime).
+        
+        Cada filtro por columna usa uno de los índices (guild_id, columna, created_at)
+        de migrations/add_moderation_logs_filter_indexes.sql.
+        """
+        query = self.client.table('moderation_logs').select('*').eq('guild_id', str(guild_id))
+        if user_id is not None:
+            query = query.eq('user_id', str(user_id))
+        if moderator_id is not None:
+            query = query.eq('moderator_id', str(moderator_id))
+        if action is not None:
+            query = query.eq('action', action)
+        if since is not None:
+            query = query.gte('created_at', since.isoformat())
+        if until is not None:
+            query = query.lt('created_at', until.isoformat())
+        return query
+    
+    def get_moderation_logs(self, guild_id: int, limit: int = 50, **filters):
+        """Obtener logs de moderación (filtros: user_id, moderator_id, action, since, until)"""
         try:
-            response = self.client.table('moderation_logs').select('*').eq('guild_id', str(guild_id)).order('created_at', desc=True).limit(limit).execute()
+            query = self._moderation_logs_query(guild_id, **filters)
+            response = self._execute(query.order('created_at', desc=True).limit(limit), 'moderation_logs', idempotent=True)
             return response.data
         except Exception as e:
             logger.error(f"Error getting moderation logs: {e}")
             return []
 
+    def get_moderation_logs_page(self, guild_id: int, limit: int = 50, cursor: str = None, **filters):
+        """Obtener una página de logs de moderación (más recientes primero) a partir de un cursor.
+        
+        Acepta los mismos filtros que get_moderation_logs.
+        Devuelve {'items', 'next_cursor'}; ValueError si el cursor no es válido.
+        """
+        after = decode_cursor(cursor, 2) if cursor else None
+        if after:
+            created_at, log_id = after
+            if not isinstance(created_at, str) or not CURSOR_TIMESTAMP.match(created_at) or not isinstance(log_id, int):
+                raise ValueError(f"Cursor no válido: {cursor!r}")
+        try:
+            query = self._moderation_logs_query(guild_id, **filters)
+            if after:
+                query = self._after_moderation_log(query, created_at, log_id)
+            query = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1)
+            rows = self._execute(query, 'moderation_logs', idempotent=True).data or []
+            
+            next_cursor = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_cursor = encode_cursor([last['created_at'], last['id']])
+            return {'items': rows[:limit], 'next_cursor': next_cursor}
+        except Exception as e:
+            logger.error(f"Error getting moderation logs page: {e}")
+            return {'items': [], 'next_cursor': None}
+    
+    def _after_moderation_log(self, query, created_at: str, log_id: int):
+        """Keyset sobre (created_at, id): filas estrictamente posteriores a la última vista"""
+        return query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{log_id})')
+    
+    def iter_moderation_log_pages(self, guild_id, page_size: int):
+        """Recorrer los logs de moderación de un servidor por páginas, de más reciente a más antiguo"""
+        last = None
+        while True:
+            query = self._moderation_logs_query(guild_id)
+            if last is not None:
+                query = self._after_moderation_log(query, last['created_at'], last['id'])
+            query = query.order('created_at', desc=True).order('id', desc=True).limit(page_size)
+            page = self._execute(query, 'moderation_logs', idempotent=True).data or []
+            if not page:
+                return
+            yield page
+            last = page[-1]
+
     # Verification Configuration
     def get_verification_config(self, guild_id: int):
         """Obtener configuración de verificación"""
+        return self._get_cached_config('verification_config', guild_id, self._fetch_verification_config)
+    
+    def _fetch_verification_config(self, guild_id: int):
         try:
-            response = self.client.table('verification_config').select('*').eq('guild_id', str(guild_id)).execute()
-            if response.data:
-                return response.data[0]
-            else:
-                return self.create_verification_config(guild_id)
+            return self._get_or_create('verification_config', {'guild_id': str(guild_id)}, self._default_verification_config(guild_id))
         except Exception as e:
             logger.error(f"Error getting verification config: {e}")
             return None
     
+    def _default_verification_config(self, guild_id: int) -> dict:
+        """Valores por defecto de verification_config"""
+        return {
+            'guild_id': str(guild_id),
+            'channel_id': None,
+            'verified_role_id': None,
+            # Actualizado para coincidir con la imagen
+            'message': '¡Bienvenido/a a nuestro servidor! Para acceder a todos los canales, por favor lee las reglas y acepta al final.'
+        }
+    
     def create_verification_config(self, guild_id: int):
         """Crear configuración de verificación por defecto"""
         try:
-            data = {
-                'guild_id': str(guild_id),
-                'channel_id': None,
-                'verified_role_id': None,
-                # Actualizado para coincidir con la imagen
-                'message': '¡Bienvenido/a a nuestro servidor! Para acceder a todos los canales, por favor lee las reglas y acepta al final.'
-            }
-            response = self.client.table('verification_config').insert(data).execute()
+            data = self._default_verification_config(guild_id)
+            response = self._execute(self.client.table('verification_config').insert(data), 'verification_config')
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error creating verification config: {e}")
@@ -274,7 +729,8 @@ class Database:
     def update_verification_config(self, guild_id: int, **kwargs):
         """Actualizar configuración de verificación"""
         try:
-            response = self.client.table('verification_config').update(kwargs).eq('guild_id', str(guild_id)).execute()
+            response = self._execute(self.client.table('verification_config').update(kwargs).eq('guild_id', str(guild_id)), 'verification_config')
+            self.invalidate_config('verification_config', guild_id)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating verification config: {e}")
@@ -283,26 +739,29 @@ class Database:
     # Game Roles Configuration
     def get_game_roles_config(self, guild_id: int):
         """Obtener configuración de roles de juegos"""
+        return self._get_cached_config('game_roles_config', guild_id, self._fetch_game_roles_config)
+    
+    def _fetch_game_roles_config(self, guild_id: int):
         try:
-            response = self.client.table('game_roles_config').select('*').eq('guild_id', str(guild_id)).execute()
-            if response.data:
-                return response.data[0]
-            else:
-                return self.create_game_roles_config(guild_id)
+            return self._get_or_create('game_roles_config', {'guild_id': str(guild_id)}, self._default_game_roles_config(guild_id))
         except Exception as e:
             logger.error(f"Error getting game roles config: {e}")
             return None
     
+    def _default_game_roles_config(self, guild_id: int) -> dict:
+        """Valores por defecto de game_roles_config"""
+        return {
+            'guild_id': str(guild_id),
+            'channel_id': None,
+            'message_id': None,
+            'roles': {}
+        }
+    
     def create_game_roles_config(self, guild_id: int):
         """Crear configuración de roles de juegos por defecto"""
         try:
-            data = {
-                'guild_id': str(guild_id),
-                'channel_id': None,
-                'message_id': None,
-                'roles': {}
-            }
-            response = self.client.table('game_roles_config').insert(data).execute()
+            data = self._default_game_roles_config(guild_id)
+            response = self._execute(self.client.table('game_roles_config').insert(data), 'game_roles_config')
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error creating game roles config: {e}")
@@ -311,7 +770,8 @@ class Database:
     def update_game_roles_config(self, guild_id: int, **kwargs):
         """Actualizar configuración de roles de juegos"""
         try:
-            response = self.client.table('game_roles_config').update(kwargs).eq('guild_id', str(guild_id)).execute()
+            response = self._execute(self.client.table('game_roles_config').update(kwargs).eq('guild_id', str(guild_id)), 'game_roles_config')
+            self.invalidate_config('game_roles_config', guild_id)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating game roles config: {e}")
@@ -320,7 +780,7 @@ class Database:
     def get_roles_config(self, guild_id: int):
         """Obtener configuración de roles de juegos para un servidor"""
         try:
-            response = self.client.table('game_roles_config').select('*').eq('guild_id', str(guild_id)).execute()
+            response = self._execute(self.client.table('game_roles_config').select('*').eq('guild_id', str(guild_id)), 'game_roles_config', idempotent=True)
             if response.data:
                 return response.data[0]
             return None
@@ -331,11 +791,22 @@ class Database:
     def update_roles_config(self, guild_id: int, roles: dict):
         """Actualizar configuración de roles de juegos para un servidor"""
         try:
-            response = self.client.table('game_roles_config').update({"roles": roles}).eq('guild_id', str(guild_id)).execute()
+            response = self._execute(self.client.table('game_roles_config').update({"roles": roles}).eq('guild_id', str(guild_id)), 'game_roles_config')
+            self.invalidate_config('game_roles_config', guild_id)
             return response.data
         except Exception as e:
             logger.error(f"Error actualizando configuración de roles: {e}")
             return None
 
+# Medir cada método público de Database (llamadas, latencia y filas devueltas)
+for _name, _method in list(vars(Database).items()):
+    if callable(_method) and not _name.startswith('_') and _name not in UNTIMED_METHODS:
+        setattr(Database, _name, metrics.timed('db.method', _name)(_method))
+
 # Instancia global
 db = Database()
+
+metrics.register_gauge('db.config_cache', db.config_cache.stats)
+metrics.register_gauge('db.single_flight', db.flights.stats)
+metrics.register_gauge('db.circuit_breakers', db.breaker_stats)
+metrics.register_gauge('leaderboards', leaderboards.stats)
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+import zlib
+import config
+
+# Columnas exportadas de cada conjunto de datos
+EXPORT_COLUMNS = {
+    'users': ('user_id', 'level', 'xp', 'messages'),
+    'modlogs': ('id', 'created_at', 'action', 'user_id', 'moderator_id', 'reason')
+}
+EXPORT_FORMATS = ('jsonl', 'csv')
+
+def export_filename(guild_id, dataset: str, fmt: str) -> str:
+    return f"botrexy-{guild_id}-{dataset}.{fmt}.gz"
+
+def _pages(database, guild_id, dataset: str):
+    if dataset == 'users':
+        return database.iter_user_pages(guild_id, config.EXPORT_PAGE_SIZE)
+    return database.iter_moderation_log_pages(guild_id, config.EXPORT_PAGE_SIZE)
+
+def _export_lines(database, guild_id, dataset: str, fmt: str):
+    """Generar las líneas del export (JSONL o CSV con cabecera) página a página"""
+    columns = EXPORT_COLUMNS[dataset]
+    pages = _pages(database, guild_id, dataset)
+
+    if fmt == 'jsonl':
+        for page in pages:
+            yield ''.join(
+                json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False) + '\n'
+                for row in page
+            )
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for page in pages:
+        writer.writerows([row.get(column) for column in columns] for row in page)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Solo la cabecera si no hay filas
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def gzip_stream(chunks, level: int = 6):
+    """Comprimir en gzip un iterable de textos sin juntarlos en memoria"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_guild_data(database, guild_id, dataset: str, fmt: str):
+    """Export comprimido de un servidor como generador de bytes (ValueError si los parámetros no son válidos)"""
+    if dataset not in EXPORT_COLUMNS or fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Export no válido: {dataset}/{fmt}")
+    return gzip_stream(_export_lines(database, guild_id, dataset, fmt))
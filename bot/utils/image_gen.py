@@ -15,6 +15,8 @@ class ImageGenerator:
         # Asegurar directorios
         os.makedirs(self.fonts_dir, exist_ok=True)
         os.makedirs(self.images_dir, exist_ok=True)
+        # Fuentes de la tarjeta de nivel por (archivo, tamaño)
+        self._rank_fonts = {}
         
         # --- CONFIGURACIÓN DE FUENTES ---
         # Intentamos cargar las fuentes Montserrat para un estilo "bello".
@@ -147,5 +149,88 @@ class ImageGenerator:
             logger.error(f"Error generating image: {e}", exc_info=True)
             return None
 
+    def _rank_font(self, name, size):
+        """Fuente de la tarjeta de nivel (se carga una vez por tamaño)"""
+        key = (name, size)
+        font = self._rank_fonts.get(key)
+        if font is None:
+            try:
+                font = ImageFont.truetype(os.path.join(self.fonts_dir, name), size)
+            except IOError:
+                try:
+                    font = ImageFont.load_default(size=size)
+                except TypeError: # Para versiones viejas de Pillow
+                    font = ImageFont.load_default()
+            self._rank_fonts[key] = font
+        return font
+
+    def generate_rank_card(self, user_name, avatar_bytes, level, progress, rank=None, total=None,
+                           bg_color='#23272a', accent_color='#7289da', text_color='#ffffff', image_format='PNG'):
+        """Genera la tarjeta de nivel (avatar, nombre, nivel, posición y barra de progreso).
+
+        `avatar_bytes` es la imagen ya descargada del avatar y `progress` la fracción
+        (0-1) de XP del nivel actual. Devuelve los bytes de la imagen o None.
+        """
+        try:
+            width, height = 934, 282
+            card = Image.new('RGBA', (width, height), color=bg_color)
+            draw = ImageDraw.Draw(card)
+
+            # 1. Avatar circular a la izquierda
+            avatar_size = 200
+            avatar_x, avatar_y = 40, (height - avatar_size) // 2
+            if avatar_bytes:
+                try:
+                    avatar = Image.open(io.BytesIO(avatar_bytes)).convert('RGBA')
+                    avatar = avatar.resize((avatar_size, avatar_size), Image.Resampling.LANCZOS)
+                    mask = Image.new('L', (avatar_size, avatar_size), 0)
+                    ImageDraw.Draw(mask).ellipse((0, 0, avatar_size, avatar_size), fill=255)
+                    card.paste(avatar, (avatar_x, avatar_y), mask=mask)
+                except Exception as e:
+                    logger.error(f"Error processing avatar: {e}")
+
+            # 2. Textos: nombre, posición y nivel
+            text_x = avatar_x + avatar_size + 40
+            bar_right = width - 50
+            font_name = self._rank_font("Montserrat-Bold.ttf", 44)
+            font_info = self._rank_font("Montserrat-Regular.ttf", 30)
+            font_small = self._rank_font("Montserrat-Regular.ttf", 24)
+
+            # Recortar nombres largos para que no se salgan de la tarjeta
+            name = user_name
+            while len(name) > 1 and draw.textlength(name, font=font_name) > bar_right - text_x:
+                name = name[:-2] + "…"
+            draw.text((text_x, 60), name, font=font_name, fill=text_color)
+
+            level_text = f"Nivel {level}"
+            level_width = draw.textlength(level_text, font=font_info)
+            draw.text((bar_right - level_width, 140), level_text, font=font_info, fill=accent_color)
+            if rank:
+                rank_text = f"#{rank} de {total}" if total else f"#{rank}"
+                draw.text((text_x, 140), rank_text, font=font_info, fill=text_color)
+
+            # 3. Barra de progreso
+            progress = min(max(progress, 0.0), 1.0)
+            bar_top, bar_height = 190, 36
+            draw.rounded_rectangle((text_x, bar_top, bar_right, bar_top + bar_height),
+                                   radius=bar_height // 2, fill='#484b4e')
+            if progress > 0:
+                fill_right = text_x + max(int((bar_right - text_x) * progress), bar_height)
+                draw.rounded_rectangle((text_x, bar_top, fill_right, bar_top + bar_height),
+                                       radius=bar_height // 2, fill=accent_color)
+            percent_text = f"{int(progress * 100)}%"
+            percent_width = draw.textlength(percent_text, font=font_small)
+            draw.text((bar_right - percent_width, bar_top + bar_height + 8), percent_text,
+                      font=font_small, fill=text_color)
+
+            # 4. Codificar
+            buffer = io.BytesIO()
+            card.save(buffer, format=image_format)
+            return buffer.getvalue()
+
+        except Exception as e:
+            logger.error(f"Error generating rank card: {e}", exc_info=True)
+            return None
+
 # Instancia global
 image_generator = ImageGenerator()
\ No newline at end of file
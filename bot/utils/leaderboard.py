@@ -0,0 +1,247 @@
+import random
+import threading
+from collections import OrderedDict
+import config
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, height: int):
+        self.key = key
+        self.next = [None] * height
+        # width[i]: posiciones que se avanzan al seguir next[i]
+        self.width = [0] * height
+
+class IndexedSkipList:
+    """Skip list ordenada con anchos por nivel.
+
+    Inserción, borrado, posición de una clave y acceso por índice en O(log n).
+    """
+
+    MAX_HEIGHT = 32
+    P = 0.25
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_HEIGHT)
+        self.height = 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_height(self) -> int:
+        height = 1
+        while height < self.MAX_HEIGHT and random.random() < self.P:
+            height += 1
+        return height
+
+    def insert(self, key):
+        update = [self.head] * self.MAX_HEIGHT
+        rank = [0] * self.MAX_HEIGHT
+        node = self.head
+        for i in reversed(range(self.height)):
+            rank[i] = rank[i + 1] if i + 1 < self.height else 0
+            while node.next[i] is not None and node.next[i].key < key:
+                rank[i] += node.width[i]
+                node = node.next[i]
+            update[i] = node
+
+        height = self._random_height()
+        if height > self.height:
+            for i in range(self.height, height):
+                rank[i] = 0
+                update[i] = self.head
+                self.head.width[i] = self.size
+            self.height = height
+
+        new = _Node(key, height)
+        for i in range(height):
+            new.next[i] = update[i].next[i]
+            update[i].next[i] = new
+            new.width[i] = update[i].width[i] - (rank[0] - rank[i])
+            update[i].width[i] = rank[0] - rank[i] + 1
+        for i in range(height, self.height):
+            update[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key) -> bool:
+        update = [self.head] * self.MAX_HEIGHT
+        node = self.head
+        for i in reversed(range(self.height)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+
+        node = node.next[0]
+        if node is None or node.key != key:
+            return False
+
+        for i in range(self.height):
+            if update[i].next[i] is node:
+                update[i].width[i] += node.width[i] - 1
+                update[i].next[i] = node.next[i]
+            else:
+                update[i].width[i] -= 1
+        while self.height > 1 and self.head.next[self.height - 1] is None:
+            self.height -= 1
+        self.size -= 1
+        return True
+
+    def index(self, key):
+        """Posición (desde 0) de una clave, o None si no está"""
+        node = self.head
+        rank = 0
+        for i in reversed(range(self.height)):
+            while node.next[i] is not None and node.next[i].key <= key:
+                rank += node.width[i]
+                node = node.next[i]
+        if node is not self.head and node.key == key:
+            return rank - 1
+        return None
+
+    def count_le(self, key) -> int:
+        """Número de claves menores o iguales que `key` (posición de la primera mayor)"""
+        node = self.head
+        rank = 0
+        for i in reversed(range(self.height)):
+            while node.next[i] is not None and node.next[i].key <= key:
+                rank += node.width[i]
+                node = node.next[i]
+        return rank
+
+    def _node_at(self, index: int):
+        target = index + 1
+        node = self.head
+        traversed = 0
+        for i in reversed(range(self.height)):
+            while node.next[i] is not None and traversed + node.width[i] <= target:
+                traversed += node.width[i]
+                node = node.next[i]
+            if traversed == target:
+                return node
+        return None
+
+    def slice(self, start: int, count: int) -> list:
+        """Claves desde la posición `start` (como mucho `count`)"""
+        if start < 0 or start >= self.size or count <= 0:
+            return []
+        node = self._node_at(start)
+        keys = []
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class GuildLeaderboard:
+    """Clasificación de un servidor ordenada por (nivel, XP) descendentes y user_id"""
+
+    def __init__(self, guild_id: str):
+        self.guild_id = guild_id
+        self.seeded = False
+        self._ranking = IndexedSkipList()
+        self._rows = {}  # {user_id: fila}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @staticmethod
+    def _key(row: dict) -> tuple:
+        return (-row['level'], -row['xp'], row['user_id'])
+
+    def _set(self, row: dict):
+        previous = self._rows.get(row['user_id'])
+        if previous is not None:
+            self._ranking.remove(self._key(previous))
+        self._rows[row['user_id']] = row
+        self._ranking.insert(self._key(row))
+
+    def update(self, user_id: str, xp: int, level: int, messages: int):
+        """Actualizar (o añadir) los totales de un usuario"""
+        row = {'guild_id': self.guild_id, 'user_id': user_id, 'xp': xp, 'level': level, 'messages': messages}
+        with self._lock:
+            self._set(row)
+
+    def seed(self, rows: list):
+        """Cargar las filas de la base de datos sin pisar los cambios recibidos mientras tanto"""
+        with self._lock:
+            for row in rows:
+                if row['user_id'] not in self._rows:
+                    self._set({
+                        'guild_id': self.guild_id,
+                        'user_id': row['user_id'],
+                        'xp': row['xp'],
+                        'level': row['level'],
+                        'messages': row['messages']
+                    })
+            self.seeded = True
+
+    def top(self, limit: int, offset: int = 0) -> list:
+        """Filas desde la posición `offset` (copias: quien las recibe puede modificarlas)"""
+        with self._lock:
+            return [dict(self._rows[key[2]]) for key in self._ranking.slice(offset, limit)]
+
+    def page_after(self, level: int, xp: int, user_id: str, limit: int):
+        """Posición y filas que van justo después de la fila (level, xp, user_id)"""
+        with self._lock:
+            offset = self._ranking.count_le((-level, -xp, user_id))
+            return offset, [dict(self._rows[key[2]]) for key in self._ranking.slice(offset, limit)]
+
+    def rank(self, user_id: str, neighbors: int = 1):
+        """Posición de un usuario (desde 1) y los `neighbors` usuarios justo por encima y por debajo"""
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                return None
+            index = self._ranking.index(self._key(row))
+            start = max(0, index - neighbors)
+            keys = self._ranking.slice(start, index - start + neighbors + 1)
+            rows = [dict(self._rows[key[2]]) for key in keys]
+            return {
+                'rank': index + 1,
+                'total': len(self._rows),
+                'user': rows[index - start],
+                'above': rows[:index - start],
+                'below': rows[index - start + 1:]
+            }
+
+class LeaderboardIndex:
+    """Clasificaciones en memoria de los servidores, compartidas por el bot y el panel web.
+
+    Se actualizan con cada cambio de XP; la primera lectura de un servidor carga
+    sus filas de la base de datos (ver Database.get_leaderboard). Se mantienen
+    como mucho LEADERBOARD_MAX_GUILDS servidores, descartando los menos usados.
+    """
+
+    def __init__(self, max_guilds: int = config.LEADERBOARD_MAX_GUILDS):
+        self.max_guilds = max_guilds
+        self._boards = OrderedDict()  # {guild_id: GuildLeaderboard}
+        self._lock = threading.Lock()
+
+    def board(self, guild_id) -> GuildLeaderboard:
+        """Clasificación de un servidor (se crea vacía y sin cargar si no existe)"""
+        guild_id = str(guild_id)
+        with self._lock:
+            board = self._boards.get(guild_id)
+            if board is None:
+                board = self._boards[guild_id] = GuildLeaderboard(guild_id)
+                while len(self._boards) > self.max_guilds:
+                    self._boards.popitem(last=False)
+            else:
+                self._boards.move_to_end(guild_id)
+            return board
+
+    def update(self, guild_id, user_id, xp: int, level: int, messages: int):
+        self.board(guild_id).update(str(user_id), xp, level, messages)
+
+    def stats(self) -> dict:
+        with self._lock:
+            boards = list(self._boards.values())
+        return {
+            'guilds': len(boards),
+            'seeded': sum(1 for board in boards if board.seeded),
+            'users': sum(len(board) for board in boards)
+        }
+
+# Instancia global
+leaderboards = LeaderboardIndex()
@@ -0,0 +1,98 @@
+import abc
+import math
+from functools import lru_cache
+import config
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él los recálculos en bloque van fila a fila
+    np = None
+
+class LevelCurve(abc.ABC):
+    """Curva de niveles: XP total necesaria para cada nivel y su inversa en O(1)"""
+
+    name = None
+
+    def __init__(self, multiplier: int):
+        if multiplier <= 0:
+            raise ValueError(f"El multiplicador debe ser positivo: {multiplier}")
+        self.multiplier = multiplier
+
+    @abc.abstractmethod
+    def xp_for_level(self, level: int) -> int:
+        """XP total necesaria para llegar a `level`"""
+
+    @abc.abstractmethod
+    def level_for_xp(self, xp: int) -> int:
+        """Nivel alcanzado con `xp` de XP total"""
+
+    @abc.abstractmethod
+    def _levels_array(self, xp):
+        """Versión vectorizada de level_for_xp sobre un array int64 de numpy"""
+
+    def levels_for_xp(self, xp_values) -> list:
+        """Niveles de muchos totales de XP a la vez (vectorizado si numpy está instalado)"""
+        if np is None:
+            return [self.level_for_xp(xp) for xp in xp_values]
+        return self._levels_array(np.asarray(xp_values, dtype=np.int64)).tolist()
+
+    def changed_levels(self, xp_values, levels) -> list:
+        """Posiciones y nuevos niveles de las filas cuyo nivel guardado no coincide con la curva"""
+        if np is None:
+            return [
+                (index, new_level)
+                for index, (xp, level) in enumerate(zip(xp_values, levels))
+                if (new_level := self.level_for_xp(xp)) != level
+            ]
+        new_levels = self._levels_array(np.asarray(xp_values, dtype=np.int64))
+        indexes = np.flatnonzero(new_levels != np.asarray(levels, dtype=np.int64))
+        return list(zip(indexes.tolist(), new_levels[indexes].tolist()))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(multiplier={self.multiplier})"
+
+class QuadraticCurve(LevelCurve):
+    """xp_for_level(n) = multiplicador * n^2 (la curva original del bot)"""
+
+    name = 'quadratic'
+
+    def xp_for_level(self, level: int) -> int:
+        return self.multiplier * level ** 2
+
+    def level_for_xp(self, xp: int) -> int:
+        return math.isqrt(max(xp, 0) // self.multiplier)
+
+    def _levels_array(self, xp):
+        quotient = np.maximum(xp, 0) // self.multiplier
+        levels = np.floor(np.sqrt(quotient)).astype(np.int64)
+        # Corregir el redondeo de sqrt en coma flotante para totales muy grandes
+        levels -= levels * levels > quotient
+        levels += (levels + 1) * (levels + 1) <= quotient
+        return levels
+
+class LinearCurve(LevelCurve):
+    """xp_for_level(n) = multiplicador * n"""
+
+    name = 'linear'
+
+    def xp_for_level(self, level: int) -> int:
+        return self.multiplier * level
+
+    def level_for_xp(self, xp: int) -> int:
+        return max(xp, 0) // self.multiplier
+
+    def _levels_array(self, xp):
+        return np.maximum(xp, 0) // self.multiplier
+
+# Curvas disponibles por nombre (columna guilds.level_curve)
+CURVES = {curve.name: curve for curve in (QuadraticCurve, LinearCurve)}
+
+@lru_cache(maxsize=None)
+def get_curve(name: str = QuadraticCurve.name, multiplier: int = config.LEVEL_MULTIPLIER) -> LevelCurve:
+    """Curva compartida para un nombre y multiplicador (ValueError si no existe)"""
+    if name not in CURVES:
+        raise ValueError(f"Curva de niveles desconocida: {name}")
+    return CURVES[name](multiplier)
+
+# Curva por defecto (LEVEL_MULTIPLIER * n^2)
+default_curve = get_curve()
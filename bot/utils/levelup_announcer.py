@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+import discord
+import config
+
+logger = logging.getLogger(__name__)
+
+class ChannelBudget:
+    """Cubo de envíos de un canal: `burst` envíos seguidos y uno más cada `interval` segundos"""
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: int):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def refill(self, burst: int, interval: float, now: float):
+        self.tokens = min(burst, self.tokens + (now - self.updated) / interval)
+        self.updated = now
+
+class LevelUpAnnouncer:
+    """Anuncios de subida de nivel agrupados y limitados por canal.
+
+    Las subidas de un mismo canal que llegan dentro de LEVELUP_COALESCE_WINDOW
+    segundos se envían en un único embed. Cada canal tiene además un presupuesto
+    de envíos (LEVELUP_CHANNEL_BURST seguidos, uno más cada LEVELUP_CHANNEL_INTERVAL
+    segundos); mientras se espera presupuesto las nuevas subidas se siguen
+    sumando al mismo embed, así que una avalancha nunca genera más envíos que
+    los que el canal admite.
+    """
+
+    def __init__(self, window: float = config.LEVELUP_COALESCE_WINDOW,
+                 burst: int = config.LEVELUP_CHANNEL_BURST, interval: float = config.LEVELUP_CHANNEL_INTERVAL,
+                 max_users: int = config.LEVELUP_EMBED_MAX_USERS):
+        self.window = window
+        self.burst = burst
+        self.interval = interval
+        self.max_users = max_users
+        self._pending = {}  # {channel_id: {user_id: (mención, nivel)}}
+        self._tasks = {}  # {channel_id: tarea que enviará el embed}
+        self._budgets = {}  # {channel_id: ChannelBudget}
+        self.announced = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def announce(self, channel, member, level: int):
+        """Anunciar que `member` ha llegado a `level` en `channel`"""
+        users = self._pending.setdefault(channel.id, {})
+        if users:
+            self.coalesced += 1
+        # Si el mismo usuario sube varias veces antes del envío, solo cuenta el último nivel
+        users[member.id] = (member.mention, level)
+        self.announced += 1
+        if channel.id not in self._tasks:
+            self._tasks[channel.id] = asyncio.create_task(self._send_later(channel))
+
+    async def _send_later(self, channel):
+        try:
+            await asyncio.sleep(self.window)
+            await self._wait_for_budget(channel.id)
+            users = self._pending.pop(channel.id, {})
+            await channel.send(embed=self._build_embed(list(users.values())))
+            self.sent += 1
+        except asyncio.CancelledError:
+            self._pending.pop(channel.id, None)
+            self._tasks.pop(channel.id, None)
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error sending level-up announcement to channel {channel.id}: {e}")
+
+        del self._tasks[channel.id]
+        # Subidas que llegaron durante el envío: van en el siguiente embed
+        if self._pending.get(channel.id):
+            self._tasks[channel.id] = asyncio.create_task(self._send_later(channel))
+
+    async def _wait_for_budget(self, channel_id: int):
+        """Esperar a que el canal tenga presupuesto y gastarlo"""
+        budget = self._budgets.get(channel_id)
+        if budget is None:
+            self._prune_budgets()
+            budget = self._budgets[channel_id] = ChannelBudget(self.burst)
+        budget.refill(self.burst, self.interval, time.monotonic())
+        if budget.tokens < 1:
+            self.throttled += 1
+            await asyncio.sleep((1 - budget.tokens) * self.interval)
+            budget.refill(self.burst, self.interval, time.monotonic())
+        budget.tokens -= 1
+
+    def _prune_budgets(self):
+        """Olvidar los canales que ya recuperaron todo su presupuesto"""
+        if len(self._budgets) < 1000:
+            return
+        now = time.monotonic()
+        full = self.burst * self.interval
+        for channel_id in [cid for cid, budget in self._budgets.items() if now - budget.updated >= full]:
+            del self._budgets[channel_id]
+
+    def _build_embed(self, users: list) -> discord.Embed:
+        if len(users) == 1:
+            mention, level = users[0]
+            description = f"{mention} ha alcanzado el **Nivel {level}**!"
+        else:
+            lines = [f"{mention} → **Nivel {level}**" for mention, level in users[:self.max_users]]
+            if len(users) > self.max_users:
+                lines.append(f"... y {len(users) - self.max_users} más")
+            description = "\n".join(lines)
+        return discord.Embed(
+            title="🎉 ¡Subida de Nivel!",
+            description=description,
+            color=discord.Color.gold()
+        )
+
+    async def stop(self):
+        """Cancelar los anuncios pendientes"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Métricas de los anuncios"""
+        return {
+            'pending_channels': len(self._tasks),
+            'announced': self.announced,
+            'coalesced': self.coalesced,
+            'sent': self.sent,
+            'throttled': self.throttled,
+            'failed': self.failed
+        }
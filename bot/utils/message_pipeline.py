@@ -0,0 +1,63 @@
+import bisect
+import logging
+import time
+from bot.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Orden de las etapas: la automoderación va antes que la XP
+STAGE_AUTOMOD = 10
+STAGE_LEVELS = 20
+
+class MessageStage:
+    """Etapa registrada en el pipeline de mensajes"""
+    __slots__ = ('name', 'order', 'handler')
+
+    def __init__(self, name: str, order: int, handler):
+        self.name = name
+        self.order = order
+        self.handler = handler
+
+class MessagePipeline:
+    """Procesamiento único de los mensajes de servidor.
+
+    El bot filtra cada mensaje y obtiene la configuración del servidor una sola
+    vez y se la pasa a las etapas en orden. Cada etapa es una corrutina
+    `handler(message, settings)`; si devuelve True el mensaje ya se trató (por
+    ejemplo, la automoderación lo borró) y no pasa a las siguientes.
+    """
+
+    def __init__(self):
+        self._stages = []  # ordenadas por `order`
+
+    def register(self, name: str, handler, order: int):
+        """Añadir (o sustituir) una etapa"""
+        self.unregister(name)
+        orders = [stage.order for stage in self._stages]
+        self._stages.insert(bisect.bisect_right(orders, order), MessageStage(name, order, handler))
+
+    def unregister(self, name: str):
+        self._stages = [stage for stage in self._stages if stage.name != name]
+
+    @property
+    def stages(self) -> list:
+        return [stage.name for stage in self._stages]
+
+    async def dispatch(self, message, settings) -> bool:
+        """Pasar el mensaje por las etapas. Devuelve True si alguna lo detuvo"""
+        for stage in self._stages:
+            start = time.perf_counter()
+            error = False
+            try:
+                handled = await stage.handler(message, settings)
+            except Exception as e:
+                # Un fallo en una etapa no impide que se ejecuten las demás
+                error = True
+                handled = False
+                logger.error(f"Error in message stage {stage.name}: {e}")
+            finally:
+                metrics.observe('message_pipeline', stage.name, time.perf_counter() - start, error=error)
+            if handled:
+                metrics.incr(f'message_pipeline.stopped.{stage.name}')
+                return True
+        return False
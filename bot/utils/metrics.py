@@ -0,0 +1,135 @@
+import functools
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+def _percentile(ordered: list, percent: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class LatencyStats:
+    """Contadores y muestra de latencias recientes (en ms) de una operación"""
+    __slots__ = ('calls', 'errors', 'rows', 'total_ms', 'max_ms', 'samples')
+
+    def __init__(self, reservoir_size: int):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=reservoir_size)
+
+    def record(self, elapsed_ms: float, rows: int, error: bool):
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+        if error:
+            self.errors += 1
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'avg_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'p50_ms': round(_percentile(ordered, 50), 3),
+            'p95_ms': round(_percentile(ordered, 95), 3),
+            'p99_ms': round(_percentile(ordered, 99), 3),
+            'max_ms': round(self.max_ms, 3)
+        }
+
+class MetricsRegistry:
+    """Registro de métricas del proceso, compartido por el bot y el panel web.
+
+    - timers: llamadas, errores, filas y percentiles de latencia por operación
+    - counters: contadores simples
+    - gauges: funciones que devuelven el estado actual de un componente
+    """
+
+    def __init__(self, reservoir_size: int = 1024):
+        self.reservoir_size = reservoir_size
+        self._timers = {}  # {grupo: {nombre: LatencyStats}}
+        self._counters = {}  # {nombre: valor}
+        self._gauges = {}  # {nombre: función}
+        self._lock = threading.Lock()
+
+    def observe(self, group: str, name: str, seconds: float, rows: int = 0, error: bool = False):
+        """Registrar una llamada de `seconds` segundos"""
+        with self._lock:
+            stats = self._timers.setdefault(group, {}).get(name)
+            if stats is None:
+                stats = self._timers[group][name] = LatencyStats(self.reservoir_size)
+            stats.record(seconds * 1000, rows, error)
+
+    def timed(self, group: str, name: str = None):
+        """Decorador que mide la latencia de una función"""
+        def decorator(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                error = False
+                result = None
+                try:
+                    result = func(*args, **kwargs)
+                    return result
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    self.observe(group, label, time.perf_counter() - start, count_rows(result), error)
+            return wrapper
+        return decorator
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, func):
+        """Registrar una función que devuelve el estado actual de un componente"""
+        with self._lock:
+            self._gauges[name] = func
+
+    def unregister_gauge(self, name: str):
+        with self._lock:
+            self._gauges.pop(name, None)
+
+    def snapshot(self) -> dict:
+        """Estado actual de todas las métricas"""
+        with self._lock:
+            timers = {
+                group: {name: stats.summary() for name, stats in sorted(entries.items())}
+                for group, entries in self._timers.items()
+            }
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+
+        gauge_values = {}
+        for name, func in gauges.items():
+            try:
+                gauge_values[name] = func()
+            except Exception as e:
+                logger.error(f"Error reading gauge {name}: {e}")
+                gauge_values[name] = None
+
+        return {'timers': timers, 'counters': counters, 'gauges': gauge_values}
+
+def count_rows(result) -> int:
+    """Número de filas en el resultado de una consulta"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+# Instancia global
+metrics = MetricsRegistry()
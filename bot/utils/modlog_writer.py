@@ -0,0 +1,189 @@
+import asyncio
+import datetime
+import logging
+import config
+from bot.utils.async_database import async_db
+from bot.utils.metrics import metrics
+from bot.utils.resilience import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+class ModLogWriter:
+    """Escritor asíncrono por lotes de logs de moderación.
+
+    `log()` solo encola la entrada, así que registrar una acción nunca retrasa la
+    moderación en sí. Una tarea en segundo plano agrupa las entradas y las guarda
+    con un único INSERT de varias filas al llenarse el lote o pasar el intervalo.
+
+    Si un lote no se puede guardar (por ejemplo, con la base de datos caída o su
+    circuito abierto) sus entradas se retienen aparte, hasta MODLOG_BACKLOG_MAX,
+    y se reintentan con backoff exponencial hasta que la base de datos responda.
+    """
+
+    def __init__(self, database, max_queue: int = config.MODLOG_QUEUE_SIZE,
+                 batch_size: int = config.MODLOG_BATCH_SIZE, flush_interval: float = config.MODLOG_FLUSH_INTERVAL,
+                 max_backlog: int = config.MODLOG_BACKLOG_MAX):
+        self.db = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._backlog = []  # entradas de lotes fallidos, en orden, pendientes de reintento
+        self._retry_attempt = 0
+        self._retry_at = 0.0
+        self._task = None
+        # Métricas de presión
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.high_water = 0
+
+    def start(self):
+        """Iniciar la tarea de escritura"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detener la tarea y guardar todo lo que quede en la cola"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+
+        # Último intento con lo retenido; lo que siga sin guardarse se pierde
+        if self._backlog:
+            await self._retry_backlog()
+        if self._backlog:
+            self.failed += len(self._backlog)
+            logger.error(f"Lost {len(self._backlog)} moderation log(s) that could not be written before shutdown")
+            self._backlog = []
+
+    def log(self, guild_id: int, user_id: int, moderator_id: int, action: str, reason: str = None) -> bool:
+        """Encolar una acción de moderación sin esperar a la base de datos"""
+        entry = {
+            'guild_id': str(guild_id),
+            'user_id': str(user_id),
+            'moderator_id': str(moderator_id),
+            'action': action,
+            'reason': reason,
+            # Fecha real de la acción, no la del volcado
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat()
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Moderation log queue full, dropping {action} entry for guild {guild_id}")
+            return False
+
+        self.enqueued += 1
+        self.high_water = max(self.high_water, self._queue.qsize())
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                if self._backlog:
+                    # Esperar entradas nuevas solo hasta el siguiente reintento de lo retenido
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), max(self._retry_at - loop.time(), 0)))
+                    except asyncio.TimeoutError:
+                        await self._retry_backlog()
+                        continue
+                else:
+                    batch.append(await self._queue.get())
+                deadline = loop.time() + self.flush_interval
+
+                # Seguir juntando entradas hasta llenar el lote o agotar el intervalo
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # El lote se vacía solo después de escribirlo: si se cancela durante la
+                # escritura, el apagado lo vuelve a intentar (mejor repetido que perdido)
+                await self._write(batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Apagado: no perder el lote que se estaba juntando o escribiendo
+            if batch:
+                await self._write(batch)
+            raise
+
+    async def _write(self, batch: list):
+        if not batch:
+            return
+        result = await self.db.log_moderation_bulk(batch)
+        self.batches += 1
+        if result is None:
+            self._hold(batch)
+        else:
+            self.written += len(batch)
+            if self._backlog:
+                # La base de datos vuelve a responder: reintentar ya lo retenido
+                self._retry_at = 0.0
+
+    def _hold(self, batch: list):
+        """Retener un lote fallido para reintentarlo más tarde"""
+        room = max(self.max_backlog - len(self._backlog), 0)
+        if len(batch) > room:
+            self.failed += len(batch) - room
+            logger.error(f"Moderation log backlog full, dropping {len(batch) - room} entry(ies)")
+        self._backlog.extend(batch[:room])
+        self._retry_at = asyncio.get_running_loop().time() + backoff_delay(
+            self._retry_attempt, config.MODLOG_RETRY_BASE_DELAY, config.MODLOG_RETRY_MAX_DELAY
+        )
+        self._retry_attempt += 1
+        logger.warning(f"Failed to write {len(batch)} moderation log(s), {len(self._backlog)} held for retry")
+
+    async def _retry_backlog(self):
+        """Guardar lo retenido por lotes, en orden, hasta vaciarlo o que vuelva a fallar"""
+        # Cada lote sale del backlog solo cuando se ha guardado: si se cancela la
+        # tarea a mitad, stop() encuentra ahí lo que falta
+        while self._backlog:
+            batch = self._backlog[:self.batch_size]
+            if await self.db.log_moderation_bulk(batch) is None:
+                self._retry_at = asyncio.get_running_loop().time() + backoff_delay(
+                    self._retry_attempt, config.MODLOG_RETRY_BASE_DELAY, config.MODLOG_RETRY_MAX_DELAY
+                )
+                self._retry_attempt += 1
+                return
+            del self._backlog[:len(batch)]
+            self.batches += 1
+            self.written += len(batch)
+        self._retry_attempt = 0
+
+    def stats(self) -> dict:
+        """Métricas de la cola de logs de moderación"""
+        return {
+            'queue_size': self._queue.qsize(),
+            'queue_max': self._queue.maxsize,
+            'backlog': len(self._backlog),
+            'high_water': self.high_water,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches
+        }
+
+# Instancia global
+modlog_writer = ModLogWriter(async_db)
+metrics.register_gauge('modlog_writer', modlog_writer.stats)
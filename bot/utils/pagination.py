@@ -0,0 +1,24 @@
+import base64
+import json
+
+def encode_cursor(values: list) -> str:
+    """Codificar la clave de la última fila de una página como cursor opaco para URLs"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Decodificar un cursor de `size` valores; ValueError si no es válido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor no válido: {cursor!r}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"Cursor no válido: {cursor!r}")
+    return values
+
+def clamp_limit(limit, default: int, maximum: int) -> int:
+    """Limitar el tamaño de página a [1, maximum]"""
+    if limit is None:
+        return default
+    return max(1, min(int(limit), maximum))
@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import features
+import config
+from bot.utils.cache import TTLCache
+from bot.utils.image_gen import image_generator
+from bot.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class RankCardRenderer:
+    """Tarjetas de nivel renderizadas en un pool de hilos y cacheadas.
+
+    La clave de la caché es (servidor, usuario, nivel, tramo de XP, posición,
+    avatar): mientras nada de eso cambie, repetir /nivel reutiliza la imagen ya
+    codificada. La barra se dibuja por tramos de 1/RANK_CARD_XP_BUCKETS para que
+    la imagen cacheada coincida con su clave. Los avatares descargados también
+    se guardan por su hash, así que subir de tramo no vuelve a descargarlo.
+    """
+
+    def __init__(self, generator, max_workers: int = config.RANK_CARD_WORKERS,
+                 cache_size: int = config.RANK_CARD_CACHE_SIZE, ttl: float = config.RANK_CARD_CACHE_TTL,
+                 buckets: int = config.RANK_CARD_XP_BUCKETS):
+        self.generator = generator
+        self.buckets = buckets
+        # WebP pesa bastante menos que PNG; si Pillow no lo soporta se usa PNG
+        self.format = 'WEBP' if features.check('webp') else 'PNG'
+        self.extension = self.format.lower()
+        self.cards = TTLCache(cache_size, ttl)  # {clave: bytes de la imagen}
+        self.avatars = TTLCache(cache_size, ttl)  # {hash del avatar: bytes}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render')
+        self._in_flight = {}  # {clave: tarea}: las peticiones simultáneas comparten el render
+        self.renders = 0
+        self.shared = 0
+
+    def bucket(self, progress: float) -> int:
+        """Tramo de progreso (0..buckets) de una fracción de XP"""
+        return min(max(int(progress * self.buckets), 0), self.buckets)
+
+    async def render(self, guild_id: int, member, level: int, progress: float, rank: int = None):
+        """Bytes de la tarjeta de `member`, o None si no se pudo generar"""
+        avatar = member.display_avatar
+        bucket = self.bucket(progress)
+        key = (guild_id, member.id, level, bucket, rank, avatar.key)
+
+        card = self.cards.get(key)
+        if card is not None:
+            return card
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._render(key, member.display_name, avatar, level, bucket, rank))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: si se cancela quien lo pidió, el render sigue para los demás
+        return await asyncio.shield(task)
+
+    async def _render(self, key, user_name: str, avatar, level: int, bucket: int, rank: int):
+        avatar_bytes = await self._avatar_bytes(avatar)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        card = await loop.run_in_executor(self._executor, functools.partial(
+            self.generator.generate_rank_card, user_name, avatar_bytes, level, bucket / self.buckets, rank,
+            image_format=self.format
+        ))
+        metrics.observe('rank_cards', 'render', time.perf_counter() - start, error=card is None)
+        self.renders += 1
+        if card is not None:
+            self.cards.set(key, card)
+        return card
+
+    async def _avatar_bytes(self, avatar):
+        """Avatar descargado (de la caché si ya se descargó con ese hash)"""
+        data = self.avatars.get(avatar.key)
+        if data is not None:
+            return data
+        try:
+            data = await avatar.with_size(256).read()
+        except Exception as e:
+            logger.error(f"Error downloading avatar: {e}")
+            return None
+        self.avatars.set(avatar.key, data)
+        return data
+
+    def shutdown(self):
+        """Cerrar el pool de renderizado"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            'renders': self.renders,
+            'shared': self.shared,
+            'cards': self.cards.stats(),
+            'avatars': self.avatars.stats()
+        }
+
+# Instancia global
+rank_cards = RankCardRenderer(image_generator)
+metrics.register_gauge('rank_cards', rank_cards.stats)
@@ -0,0 +1,76 @@
+import random
+import threading
+import time
+
+class CircuitOpenError(Exception):
+    """El circuito del endpoint está abierto: la llamada se rechaza sin intentarla"""
+
+    def __init__(self, endpoint: str):
+        super().__init__(f"Circuit open for {endpoint}")
+        self.endpoint = endpoint
+
+class CircuitBreaker:
+    """Circuit breaker de un endpoint (tabla o RPC).
+
+    Tras `failure_threshold` fallos seguidos se abre y rechaza las llamadas
+    durante `reset_timeout` segundos. Después deja pasar una sola llamada de
+    prueba (semiabierto): si funciona se cierra y si falla vuelve a abrirse.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.trips = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Indicar si se puede intentar una llamada ahora"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'trips': self.trips
+            }
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Espera con backoff exponencial y jitter completo para el intento `attempt` (desde 0)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from bot.utils.level_curve import CURVES, QuadraticCurve, get_curve
+import config
+
+def _value(row: dict, key: str, default):
+    """Valor de una columna, o `default` si falta o es NULL"""
+    value = row.get(key)
+    return default if value is None else value
+
+@dataclass(frozen=True, slots=True)
+class AutomodSettings:
+    """Configuración de automoderación de un servidor"""
+    anti_spam: bool = True
+    anti_links: bool = False
+    anti_invites: bool = True
+    bad_words: tuple = ()
+    max_mentions: int = config.MAX_MENTIONS
+    max_emojis: int = config.MAX_EMOJIS
+
+    @classmethod
+    def from_row(cls, row: dict):
+        return cls(
+            anti_spam=_value(row, 'anti_spam', True),
+            anti_links=_value(row, 'anti_links', False),
+            anti_invites=_value(row, 'anti_invites', True),
+            bad_words=tuple(_value(row, 'bad_words', ())),
+            max_mentions=_value(row, 'max_mentions', config.MAX_MENTIONS),
+            max_emojis=_value(row, 'max_emojis', config.MAX_EMOJIS)
+        )
+
+@dataclass(frozen=True, slots=True)
+class WelcomeSettings:
+    """Configuración de bienvenida de un servidor"""
+    channel_id: str = None
+    message: str = '¡Bienvenido {user} a {server}!'
+    image_enabled: bool = True
+    image_background: str = '#7289da'
+    image_text_color: str = '#ffffff'
+    background_image_url: str = None
+
+    @classmethod
+    def from_row(cls, row: dict):
+        return cls(
+            channel_id=row.get('channel_id'),
+            message=_value(row, 'message', '¡Bienvenido {user} a {server}!'),
+            image_enabled=_value(row, 'image_enabled', True),
+            image_background=_value(row, 'image_background', '#7289da'),
+            image_text_color=_value(row, 'image_text_color', '#ffffff'),
+            background_image_url=row.get('background_image_url')
+        )
+
+@dataclass(frozen=True, slots=True)
+class VerificationSettings:
+    """Configuración de verificación de un servidor"""
+    channel_id: str = None
+    verified_role_id: str = None
+    message: str = None
+
+    @classmethod
+    def from_row(cls, row: dict):
+        return cls(
+            channel_id=row.get('channel_id'),
+            verified_role_id=row.get('verified_role_id'),
+            message=row.get('message')
+        )
+
+@dataclass(frozen=True, slots=True)
+class GuildSettings:
+    """Instantánea inmutable de toda la configuración de un servidor"""
+    guild_id: str
+    prefix: str = config.BOT_PREFIX
+    automod_enabled: bool = True
+    levels_enabled: bool = True
+    welcome_enabled: bool = False
+    verification_enabled: bool = False
+    level_curve: str = QuadraticCurve.name
+    level_multiplier: int = config.LEVEL_MULTIPLIER
+    levelup_channel_id: str = None
+    automod: AutomodSettings = AutomodSettings()
+    welcome: WelcomeSettings = WelcomeSettings()
+    verification: VerificationSettings = VerificationSettings()
+
+    @property
+    def curve(self):
+        """Curva de niveles del servidor"""
+        return get_curve(self.level_curve, self.level_multiplier)
+
+    @classmethod
+    def from_rows(cls, guild: dict, automod: dict, welcome: dict, verification: dict):
+        """Construir la instantánea a partir de las filas de cada tabla"""
+        # Una curva desconocida o un multiplicador no válido vuelven a la curva por defecto
+        level_curve = _value(guild, 'level_curve', QuadraticCurve.name)
+        level_multiplier = _value(guild, 'level_multiplier', config.LEVEL_MULTIPLIER)
+        if level_curve not in CURVES or level_multiplier <= 0:
+            level_curve, level_multiplier = QuadraticCurve.name, config.LEVEL_MULTIPLIER
+        return cls(
+            guild_id=guild['guild_id'],
+            prefix=_value(guild, 'prefix', config.BOT_PREFIX),
+            automod_enabled=_value(guild, 'automod_enabled', True),
+            levels_enabled=_value(guild, 'levels_enabled', True),
+            welcome_enabled=_value(guild, 'welcome_enabled', False),
+            verification_enabled=_value(guild, 'verification_enabled', False),
+            level_curve=level_curve,
+            level_multiplier=level_multiplier,
+            levelup_channel_id=guild.get('levelup_channel_id'),
+            automod=AutomodSettings.from_row(automod),
+            welcome=WelcomeSettings.from_row(welcome),
+            verification=VerificationSettings.from_row(verification)
+        )
@@ -0,0 +1,373 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from bot.utils.level_curve import get_curve
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'database_schema_sqlite.sql')
+
+# Columnas JSONB (guardadas como TEXT) y BOOLEAN (guardadas como INTEGER)
+JSON_COLUMNS = frozenset({'bad_words', 'roles'})
+BOOL_COLUMNS = frozenset({
+    'automod_enabled', 'levels_enabled', 'welcome_enabled', 'verification_enabled',
+    'image_enabled', 'anti_spam', 'anti_links', 'anti_invites'
+})
+
+# Tablas que se pueden crear con get_or_create_row (igual que la función de Postgres)
+GET_OR_CREATE_TABLES = frozenset({
+    'guilds', 'users', 'welcome_config', 'automod_config', 'verification_config', 'game_roles_config'
+})
+
+# Columnas añadidas por migraciones posteriores al esquema inicial: (tabla, columna, definición).
+# Se agregan al abrir una base de datos creada con una versión anterior del esquema.
+ADDED_COLUMNS = (
+    ('guilds', 'level_curve', "TEXT DEFAULT 'quadratic'"),
+    ('guilds', 'level_multiplier', 'INTEGER DEFAULT 100'),
+    ('guilds', 'levelup_channel_id', 'TEXT'),
+)
+
+_IDENTIFIER = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+# Operadores admitidos dentro de los filtros or_ de postgrest
+_LOGIC_OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+_LOGIC_GROUP = re.compile(r'^(and|or)\((.*)\)$', re.DOTALL)
+
+def _ident(name: str) -> str:
+    """Validar y entrecomillar un nombre de tabla o columna"""
+    name = name.strip()
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Identificador no válido: {name!r}")
+    return f'"{name}"'
+
+def _encode(column: str, value):
+    if column in JSON_COLUMNS and value is not None and not isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def _decode_row(row: sqlite3.Row) -> dict:
+    data = dict(row)
+    for column, value in data.items():
+        if value is None:
+            continue
+        if column in JSON_COLUMNS:
+            data[column] = json.loads(value)
+        elif column in BOOL_COLUMNS:
+            data[column] = bool(value)
+    return data
+
+def _split_logic(text: str) -> list:
+    """Separar por comas de primer nivel (fuera de paréntesis y comillas)"""
+    items, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            items.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    items.append(''.join(current))
+    return [item.strip() for item in items if item.strip()]
+
+def _logic_sql(text: str, joiner: str, params: list) -> str:
+    """Traducir un árbol lógico de postgrest ('a.eq.1,and(b.lt.2,c.gt.3)') a SQL"""
+    parts = []
+    for item in _split_logic(text):
+        group = _LOGIC_GROUP.match(item)
+        if group:
+            parts.append(f"({_logic_sql(group.group(2), group.group(1).upper(), params)})")
+            continue
+        column, operator, value = item.split('.', 2)
+        if operator not in _LOGIC_OPERATORS:
+            raise ValueError(f"Operador no soportado en or_: {operator}")
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        parts.append(f"{_ident(column)} {_LOGIC_OPERATORS[operator]} ?")
+        params.append(value)
+    return f' {joiner} '.join(parts)
+
+class SQLiteResponse:
+    """Respuesta con la misma forma que la de postgrest (`.data`)"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+class SQLiteClient:
+    """Backend local SQLite con la misma interfaz que usa Database del cliente de Supabase.
+
+    Implementa el subconjunto del query builder de postgrest que usa el bot
+    (`table(...).select/insert/upsert/update/delete` con filtros, `or_`, orden y límite)
+    y las funciones RPC de `migrations/`. Usa modo WAL, una conexión por hilo y
+    sentencias parametrizadas que sqlite3 reutiliza desde su caché.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        with open(SCHEMA_PATH, encoding='utf-8') as f:
+            self.connection().executescript(f.read())
+        self._add_missing_columns()
+        logger.info(f"SQLite database ready at {path}")
+
+    def _add_missing_columns(self):
+        conn = self.connection()
+        for table, column, definition in ADDED_COLUMNS:
+            columns = {row['name'] for row in conn.execute(f"PRAGMA table_info({_ident(table)})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {_ident(table)} ADD COLUMN {_ident(column)} {definition}")
+                logger.info(f"Added column {table}.{column}")
+
+    def connection(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (se crea la primera vez)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=512)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Transacción de escritura (una a la vez dentro del proceso)"""
+        conn = self.connection()
+        with self._write_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            else:
+                conn.execute('COMMIT')
+
+    def table(self, name: str):
+        return SQLiteQuery(self, name)
+
+    def rpc(self, name: str, params: dict = None):
+        return SQLiteRPC(self, name, params or {})
+
+class SQLiteQuery:
+    """Query builder compatible con el de postgrest-py"""
+
+    def __init__(self, client: SQLiteClient, table: str):
+        self.client = client
+        self.table = _ident(table)
+        self._action = 'select'
+        self._columns = '*'
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+
+    # Acciones
+    def select(self, columns: str = '*'):
+        self._action = 'select'
+        self._columns = '*' if columns.strip() == '*' else ', '.join(_ident(c) for c in columns.split(','))
+        return self
+
+    def insert(self, data):
+        self._action = 'insert'
+        self._payload = data
+        return self
+
+    def upsert(self, data, on_conflict: str = 'id', ignore_duplicates: bool = False):
+        self._action = 'upsert'
+        self._payload = data
+        self._on_conflict = [c.strip() for c in on_conflict.split(',')]
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, data: dict):
+        self._action = 'update'
+        self._payload = data
+        return self
+
+    def delete(self):
+        self._action = 'delete'
+        return self
+
+    # Filtros
+    def _filter(self, column: str, operator: str, value):
+        self._where.append(f"{_ident(column)} {operator} ?")
+        self._params.append(_encode(column, value))
+        return self
+
+    def eq(self, column: str, value):
+        return self._filter(column, '=', value)
+
+    def neq(self, column: str, value):
+        return self._filter(column, '!=', value)
+
+    def gt(self, column: str, value):
+        return self._filter(column, '>', value)
+
+    def gte(self, column: str, value):
+        return self._filter(column, '>=', value)
+
+    def lt(self, column: str, value):
+        return self._filter(column, '<', value)
+
+    def lte(self, column: str, value):
+        return self._filter(column, '<=', value)
+
+    def in_(self, column: str, values):
+        values = list(values)
+        if not values:
+            self._where.append('0')
+            return self
+        self._where.append(f"{_ident(column)} IN ({', '.join('?' * len(values))})")
+        self._params.extend(_encode(column, v) for v in values)
+        return self
+
+    def or_(self, filters: str):
+        params = []
+        self._where.append(f"({_logic_sql(filters, 'OR', params)})")
+        self._params.extend(params)
+        return self
+
+    # Orden y límite
+    def order(self, column: str, desc: bool = False):
+        self._order.append(f"{_ident(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int):
+        self._limit = int(size)
+        return self
+
+    def _where_sql(self) -> str:
+        return f" WHERE {' AND '.join(self._where)}" if self._where else ''
+
+    def execute(self) -> SQLiteResponse:
+        if self._action == 'select':
+            sql = f"SELECT {self._columns} FROM {self.table}{self._where_sql()}"
+            if self._order:
+                sql += f" ORDER BY {', '.join(self._order)}"
+            if self._limit is not None:
+                sql += f" LIMIT {self._limit}"
+            rows = self.client.connection().execute(sql, self._params).fetchall()
+            return SQLiteResponse([_decode_row(row) for row in rows])
+
+        with self.client.transaction() as conn:
+            if self._action in ('insert', 'upsert'):
+                rows = self._payload if isinstance(self._payload, list) else [self._payload]
+                return SQLiteResponse([row for row in (self._insert_row(conn, r) for r in rows) if row])
+
+            if self._action == 'update':
+                columns = list(self._payload)
+                assignments = ', '.join(f"{_ident(c)} = ?" for c in columns)
+                params = [_encode(c, self._payload[c]) for c in columns] + self._params
+                cursor = conn.execute(f"UPDATE {self.table} SET {assignments}{self._where_sql()} RETURNING *", params)
+            else:
+                cursor = conn.execute(f"DELETE FROM {self.table}{self._where_sql()} RETURNING *", self._params)
+            return SQLiteResponse([_decode_row(row) for row in cursor.fetchall()])
+
+    def _insert_row(self, conn, row: dict):
+        columns = list(row)
+        sql = (
+            f"INSERT INTO {self.table} ({', '.join(_ident(c) for c in columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        if self._action == 'upsert':
+            conflict = ', '.join(_ident(c) for c in self._on_conflict)
+            updates = [c for c in columns if c not in self._on_conflict]
+            if self._ignore_duplicates or not updates:
+                sql += f" ON CONFLICT ({conflict}) DO NOTHING"
+            else:
+                sql += f" ON CONFLICT ({conflict}) DO UPDATE SET " + ', '.join(f"{_ident(c)} = excluded.{_ident(c)}" for c in updates)
+        result = conn.execute(sql + " RETURNING *", [_encode(c, row[c]) for c in columns]).fetchone()
+        return _decode_row(result) if result else None
+
+class SQLiteRPC:
+    """Llamada a una función RPC implementada en Python"""
+
+    def __init__(self, client: SQLiteClient, name: str, params: dict):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> SQLiteResponse:
+        if self.name not in RPC_FUNCTIONS:
+            raise ValueError(f"Función RPC desconocida: {self.name}")
+        function, readonly = RPC_FUNCTIONS[self.name]
+        if readonly:
+            return SQLiteResponse(function(self.client.connection(), **self.params))
+        with self.client.transaction() as conn:
+            return SQLiteResponse(function(conn, **self.params))
+
+# Equivalentes de las funciones de Postgres en migrations/: {nombre: (función, solo_lectura)}
+RPC_FUNCTIONS = {}
+
+def rpc_function(name: str, readonly: bool = False):
+    def decorator(func):
+        RPC_FUNCTIONS[name] = (func, readonly)
+        return func
+    return decorator
+
+@rpc_function('increment_users_xp')
+def increment_users_xp(conn, p_rows: list):
+    results = []
+    for row in p_rows:
+        conn.execute(
+            "INSERT INTO users (guild_id, user_id, xp, level, messages) VALUES (?, ?, 0, 0, 0) "
+            "ON CONFLICT (guild_id, user_id) DO NOTHING",
+            (row['guild_id'], row['user_id'])
+        )
+        old = conn.execute("SELECT xp, level, messages FROM users WHERE guild_id = ? AND user_id = ?", (row['guild_id'], row['user_id'])).fetchone()
+        xp = old['xp'] + row['xp']
+        level = max(old['level'], get_curve(row['curve'], row['multiplier']).level_for_xp(xp))
+        messages = old['messages'] + row['messages']
+        conn.execute(
+            "UPDATE users SET xp = ?, level = ?, messages = ? WHERE guild_id = ? AND user_id = ?",
+            (xp, level, messages, row['guild_id'], row['user_id'])
+        )
+        results.append({
+            'guild_id': row['guild_id'], 'user_id': row['user_id'], 'leveled_up': level > old['level'],
+            'new_level': level, 'total_xp': xp, 'total_messages': messages
+        })
+    return results
+
+@rpc_function('get_or_create_row')
+def get_or_create_row(conn, p_table: str, p_key: dict, p_defaults: dict = None):
+    if p_table not in GET_OR_CREATE_TABLES:
+        raise ValueError(f"get_or_create_row: tabla no permitida {p_table}")
+    data = {**(p_defaults or {}), **p_key}
+    columns = list(data)
+    table = _ident(p_table)
+    conn.execute(
+        f"INSERT INTO {table} ({', '.join(_ident(c) for c in columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT ({', '.join(_ident(c) for c in p_key)}) DO NOTHING",
+        [_encode(c, data[c]) for c in columns]
+    )
+    row = conn.execute(
+        f"SELECT * FROM {table} WHERE {' AND '.join(f'{_ident(c)} = ?' for c in p_key)}",
+        list(p_key.values())
+    ).fetchone()
+    return _decode_row(row) if row else None
+
+@rpc_function('get_guild_settings', readonly=True)
+def get_guild_settings(conn, p_guild_id: str):
+    settings = {}
+    for key, table in (('guild', 'guilds'), ('automod', 'automod_config'), ('welcome', 'welcome_config'), ('verification', 'verification_config')):
+        row = conn.execute(f"SELECT * FROM {table} WHERE guild_id = ?", (p_guild_id,)).fetchone()
+        settings[key] = _decode_row(row) if row else None
+    return settings
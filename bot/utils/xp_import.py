@@ -0,0 +1,298 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import config
+from bot.utils.database import db
+from bot.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'json')
+
+# Nombres de columna aceptados (en minúsculas y sin '_' ni espacios): cada bot exporta con los suyos
+USER_ID_FIELDS = ('userid', 'id', 'user', 'memberid', 'discordid')
+XP_FIELDS = ('xp', 'exp', 'experience', 'totalxp', 'points')
+MESSAGES_FIELDS = ('messages', 'messagecount', 'totalmessages', 'msgs')
+
+# Las columnas xp y messages son INTEGER en la base de datos
+MAX_VALUE = 2 ** 31 - 1
+# Caracteres leídos por bloque y tamaño máximo de un registro JSON
+READ_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 64 * 1024
+
+def open_upload(file, compressed: bool = False):
+    """Abrir un archivo subido (binario, opcionalmente .gz) como texto UTF-8 con o sin BOM"""
+    if compressed:
+        file = gzip.GzipFile(fileobj=file, mode='rb')
+    return io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+def iter_json_records(stream):
+    """Leer registros JSON de un texto sin cargarlo entero.
+
+    Acepta un array de objetos (`[{...}, {...}]`) o un objeto por línea (JSONL).
+    Lanza ValueError si el JSON no es válido.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+    while True:
+        # Saltar separadores entre registros (y el cierre del array)
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,]':
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                return
+            buffer, pos = stream.read(READ_SIZE), 0
+            eof = not buffer
+            continue
+        if not started:
+            started = True
+            if buffer[pos] == '[':
+                pos += 1
+                continue
+        try:
+            value, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            # Registro incompleto: leer más texto salvo que ya no quede o sea demasiado largo
+            if eof or len(buffer) - pos > MAX_RECORD_SIZE:
+                raise ValueError(f"JSON no válido: {e}") from None
+            data = stream.read(READ_SIZE)
+            buffer, pos = buffer[pos:] + data, 0
+            eof = not data
+            continue
+        yield value
+
+def iter_records(stream, fmt: str):
+    """Registros (diccionarios) de un archivo CSV con cabecera o JSON"""
+    if fmt == 'csv':
+        return csv.DictReader(stream)
+    return iter_json_records(stream)
+
+def _field(fields: dict, names: tuple):
+    for name in names:
+        if name in fields:
+            return fields[name]
+    return None
+
+def _integer(value):
+    """Entero no negativo a partir de un número o texto ("1200", "1200.0"), o None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = int(value)
+        except ValueError:
+            try:
+                value = float(value)
+            except ValueError:
+                return None
+    if isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            return None
+        value = int(value)
+    if not isinstance(value, int) or value < 0:
+        return None
+    return value
+
+def parse_record(record):
+    """(user_id, xp, mensajes o None) de un registro, o None si no es válido.
+
+    El nivel del archivo se ignora: se recalcula con la curva del servidor.
+    """
+    if not isinstance(record, dict):
+        return None
+    fields = {
+        key.strip().lower().replace('_', '').replace(' ', ''): value
+        for key, value in record.items() if isinstance(key, str)
+    }
+    user_id = _integer(_field(fields, USER_ID_FIELDS))
+    xp = _integer(_field(fields, XP_FIELDS))
+    if not user_id or xp is None or xp > MAX_VALUE:
+        return None
+    messages = _field(fields, MESSAGES_FIELDS)
+    # Una celda vacía de CSV cuenta como columna ausente
+    if messages == '':
+        messages = None
+    if messages is not None:
+        messages = _integer(messages)
+        if messages is None or messages > MAX_VALUE:
+            return None
+    return user_id, xp, messages
+
+class ImportJob:
+    """Progreso de una importación de XP"""
+
+    def __init__(self, guild_id: int, fmt: str, total_bytes: int):
+        self.id = uuid.uuid4().hex
+        self.guild_id = guild_id
+        self.format = fmt
+        self.status = 'running'
+        self.error = None
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.chunks = 0
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            'id': self.id,
+            'guild_id': str(self.guild_id),
+            'format': self.format,
+            'status': self.status,
+            'error': self.error,
+            'progress': round(self.bytes_read / self.total_bytes, 3) if self.total_bytes else 0,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'chunks': self.chunks,
+            'elapsed': round(elapsed, 2),
+            'rows_per_second': round(self.rows_read / elapsed, 1) if elapsed > 0 else 0
+        }
+
+def import_users(database, job: ImportJob, raw, fmt: str, curve, compressed: bool = False,
+                 chunk_size: int = config.XP_IMPORT_CHUNK, on_chunk=None):
+    """Importar los totales de XP de un archivo por bloques de `chunk_size` usuarios.
+
+    Los niveles se calculan con `curve`. Si un usuario aparece varias veces vale
+    la última. `on_chunk(rows)` se llama con las filas de cada bloque guardado.
+    Lanza ValueError si el archivo no es válido y RuntimeError si falla un bloque.
+    """
+    guild_id = str(job.guild_id)
+    seen = set()
+    pending = {}  # {user_id: (xp, mensajes)}: sin repetidos dentro de un mismo upsert
+
+    def write():
+        user_ids = list(pending)
+        totals = list(pending.values())
+        levels = curve.levels_for_xp([xp for xp, _ in totals])
+        # Un upsert en bloque escribe las mismas columnas en todas sus filas: las
+        # filas sin mensajes van aparte para conservar los que ya hay en la base de datos
+        with_messages, without_messages = [], []
+        for user_id, (xp, messages), level in zip(user_ids, totals, levels):
+            row = {'guild_id': guild_id, 'user_id': str(user_id), 'xp': xp, 'level': level}
+            if messages is None:
+                without_messages.append(row)
+            else:
+                row['messages'] = messages
+                with_messages.append(row)
+        for rows in (with_messages, without_messages):
+            if rows and database.import_users(job.guild_id, rows) is None:
+                raise RuntimeError(f"Error guardando el bloque {job.chunks + 1}")
+        pending.clear()
+        rows = with_messages + without_messages
+        job.rows_written += len(rows)
+        job.chunks += 1
+        job.bytes_read = raw.tell()
+        if on_chunk:
+            on_chunk(rows)
+
+    # La referencia evita que el texto se cierre (y con él `raw`) al agotarse los registros
+    stream = open_upload(raw, compressed)
+    for record in iter_records(stream, fmt):
+        job.rows_read += 1
+        parsed = parse_record(record)
+        if parsed is None:
+            job.invalid += 1
+            continue
+        user_id, xp, messages = parsed
+        if user_id in seen:
+            job.duplicates += 1
+        else:
+            seen.add(user_id)
+        pending.pop(user_id, None)
+        pending[user_id] = (xp, messages)
+        if len(pending) >= chunk_size:
+            write()
+
+    if pending:
+        write()
+    job.bytes_read = job.total_bytes
+
+class ImportManager:
+    """Importaciones en segundo plano (un hilo por importación, una a la vez por servidor).
+
+    Guarda el estado de las últimas `max_jobs` importaciones para consultar su progreso.
+    """
+
+    def __init__(self, database, max_jobs: int = 50):
+        self.db = database
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()  # {job_id: ImportJob}
+        self._lock = threading.Lock()
+
+    def start(self, guild_id: int, path: str, fmt: str, curve, compressed: bool = False, on_chunk=None):
+        """Importar en segundo plano el archivo `path` (se borra al terminar).
+
+        Devuelve el ImportJob, o None si el servidor ya tiene una importación en curso.
+        """
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Formato de importación no válido: {fmt}")
+        with self._lock:
+            if any(job.guild_id == guild_id and job.status == 'running' for job in self._jobs.values()):
+                return None
+            job = ImportJob(guild_id, fmt, os.path.getsize(path))
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        threading.Thread(
+            target=self._run, args=(job, path, fmt, curve, compressed, on_chunk),
+            name=f"xp-import-{job.id[:8]}", daemon=True
+        ).start()
+        return job
+
+    def _run(self, job: ImportJob, path: str, fmt: str, curve, compressed: bool, on_chunk):
+        try:
+            with open(path, 'rb') as raw:
+                import_users(self.db, job, raw, fmt, curve, compressed, on_chunk=on_chunk)
+            job.status = 'done'
+            logger.info(f"XP import {job.id} for guild {job.guild_id}: {job.to_dict()}")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"XP import {job.id} for guild {job.guild_id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, guild_id: int, job_id: str):
+        """Estado de una importación del servidor, o None si no existe"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.guild_id != guild_id:
+            return None
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            'running': sum(1 for job in jobs if job.status == 'running'),
+            'done': sum(1 for job in jobs if job.status == 'done'),
+            'failed': sum(1 for job in jobs if job.status == 'failed'),
+            'rows_written': sum(job.rows_written for job in jobs)
+        }
+
+# Instancia global
+xp_imports = ImportManager(db)
+metrics.register_gauge('xp_imports', xp_imports.stats)
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import time
+import config
+from bot.utils.leaderboard import leaderboards
+from bot.utils.level_curve import default_curve
+
+logger = logging.getLogger(__name__)
+
+class LedgerEntry:
+    """Totales conocidos de un usuario en un servidor"""
+    __slots__ = ('xp', 'level', 'messages', 'last_seen')
+
+    def __init__(self, xp: int, level: int, messages: int):
+        self.xp = xp
+        self.level = level
+        self.messages = messages
+        self.last_seen = time.monotonic()
+
+class XPLedger:
+    """Acumulador write-behind de XP.
+
+    Mantiene en memoria los totales de cada (guild_id, user_id) activo para
+    detectar las subidas de nivel al momento, y acumula aparte los incrementos
+    de XP y mensajes aún no guardados. Cada XP_FLUSH_INTERVAL segundos los
+    incrementos se suman en la base de datos con una única llamada a
+    increment_users_xp: al sumar en lugar de escribir totales, un volcado nunca
+    pisa un reseteo, una importación ni la XP de otro proceso. Ante una caída
+    solo se pierde como mucho la XP de la última ventana de volcado.
+
+    Si la base de datos no responde al cargar un usuario, su XP se acumula igual
+    (hasta XP_BACKLOG_MAX usuarios sin cargar) y se suma en el siguiente volcado.
+    """
+
+    def __init__(self, database, flush_interval: float = config.XP_FLUSH_INTERVAL,
+                 max_pending: int = config.XP_FLUSH_MAX_PENDING, idle_ttl: float = config.XP_LEDGER_IDLE_TTL,
+                 max_backlog: int = config.XP_BACKLOG_MAX):
+        self.db = database
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.idle_ttl = idle_ttl
+        self.max_backlog = max_backlog
+        self._entries = {}  # {(guild_id, user_id): LedgerEntry}
+        self._pending = {}  # {(guild_id, user_id): [xp, mensajes, curva]}: incrementos sin guardar
+        self._unloaded = set()  # claves con incrementos pendientes de usuarios que no se pudieron cargar
+        self.dropped_xp = 0
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._early_flush = None  # volcado anticipado en curso (al llegar a max_pending)
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        """Iniciar el volcado periódico"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Detener el volcado periódico y guardar lo pendiente"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._early_flush is not None:
+            await asyncio.gather(self._early_flush, return_exceptions=True)
+            self._early_flush = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing XP ledger: {e}")
+
+    async def add_xp(self, guild_id: int, user_id: int, xp: int, curve=default_curve):
+        """Sumar XP en memoria y devolver si el usuario subió de nivel según la curva del servidor"""
+        key = (guild_id, user_id)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            user = await self.db.get_user_level(guild_id, user_id)
+            if not user:
+                self._buffer(key, xp, curve)
+                return None
+            entry = self._load(key, user)
+
+        entry.xp += xp
+        entry.messages += 1
+        self._add_pending(key, xp, 1, curve)
+        leveled_up = self._apply(key, entry, curve)
+
+        if len(self._pending) >= self.max_pending and not self._flush_lock.locked() and (
+                self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.create_task(self._flush_early())
+
+        return {'leveled_up': leveled_up, 'new_level': entry.level}
+
+    async def _flush_early(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing XP ledger: {e}")
+
+    def _load(self, key, user: dict) -> LedgerEntry:
+        # Otro mensaje pudo cargar la entrada mientras esperábamos
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = LedgerEntry(user['xp'], user['level'], user['messages'])
+            # Los totales leídos aún no incluyen lo acumulado mientras no se podía cargar
+            pending = self._pending.get(key)
+            if pending is not None:
+                entry.xp += pending[0]
+                entry.messages += pending[1]
+            self._unloaded.discard(key)
+            self._entries[key] = entry
+        return entry
+
+    def _add_pending(self, key, xp: int, messages: int, curve):
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = [xp, messages, curve]
+        else:
+            pending[0] += xp
+            pending[1] += messages
+            pending[2] = curve
+
+    def _apply(self, key, entry: LedgerEntry, curve) -> bool:
+        """Recalcular el nivel tras sumar XP"""
+        entry.last_seen = time.monotonic()
+        # Sumar XP nunca baja de nivel; solo recompute_levels puede hacerlo
+        level = max(entry.level, curve.level_for_xp(entry.xp))
+        leveled_up = level > entry.level
+        entry.level = level
+        leaderboards.update(key[0], key[1], entry.xp, entry.level, entry.messages)
+        return leveled_up
+
+    def _buffer(self, key, xp: int, curve):
+        """Acumular la XP de un usuario que no se pudo cargar de la base de datos"""
+        if key not in self._pending and len(self._unloaded) >= self.max_backlog:
+            self.dropped_xp += xp
+            return
+        self._unloaded.add(key)
+        self._add_pending(key, xp, 1, curve)
+
+    def peek(self, guild_id: int, user_id: int):
+        """Totales en memoria de un usuario, o None si no está cargado"""
+        entry = self._entries.get((guild_id, user_id))
+        if entry is None:
+            return None
+        return {'xp': entry.xp, 'level': entry.level, 'messages': entry.messages}
+
+    def refresh_levels(self, guild_id: int, curve):
+        """Recalcular con `curve` el nivel de los usuarios en memoria de un servidor (tras cambiar su curva)"""
+        for key, entry in self._entries.items():
+            if key[0] == guild_id:
+                entry.level = curve.level_for_xp(entry.xp)
+                leaderboards.update(guild_id, key[1], entry.xp, entry.level, entry.messages)
+        # Los incrementos pendientes se guardarán con la curva nueva
+        for key, pending in self._pending.items():
+            if key[0] == guild_id:
+                pending[2] = curve
+
+    def replace(self, guild_id: int, rows: list):
+        """Sustituir los totales en memoria por filas importadas ya guardadas.
+
+        Los incrementos pendientes de esos usuarios se descartan: son anteriores a
+        la importación, que fija sus totales.
+        """
+        for row in rows:
+            key = (guild_id, int(row['user_id']))
+            self._pending.pop(key, None)
+            self._unloaded.discard(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            entry.xp = row['xp']
+            entry.level = row['level']
+            entry.messages = row.get('messages', entry.messages)
+
+    def discard(self, guild_id: int, user_id: int):
+        """Olvidar un usuario y su XP sin guardar"""
+        key = (guild_id, user_id)
+        self._entries.pop(key, None)
+        self._pending.pop(key, None)
+        self._unloaded.discard(key)
+
+    async def reset_user(self, guild_id: int, user_id: int):
+        """Resetear la XP de un usuario en memoria y en la base de datos.
+
+        Espera a que termine el volcado en curso: así la XP que ese volcado esté
+        sumando no puede llegar después del reseteo y devolverle la XP.
+        """
+        async with self._flush_lock:
+            self.discard(guild_id, user_id)
+            return await self.db.reset_user(guild_id, user_id)
+
+    async def flush(self):
+        """Sumar en la base de datos, en una sola llamada, los incrementos pendientes"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = self._pending, {}
+            unloaded, self._unloaded = self._unloaded, set()
+            rows = [
+                {
+                    'guild_id': str(guild_id),
+                    'user_id': str(user_id),
+                    'xp': xp,
+                    'messages': messages,
+                    'curve': curve.name,
+                    'multiplier': curve.multiplier
+                }
+                for (guild_id, user_id), (xp, messages, curve) in pending.items()
+            ]
+
+            results = await self.db.increment_users_xp(rows)
+            if results is None:
+                # Conservar los incrementos (más los que llegaron mientras tanto) para el siguiente intento
+                for key, (xp, messages, curve) in pending.items():
+                    current = self._pending.get(key)
+                    if current is None:
+                        self._pending[key] = [xp, messages, curve]
+                    else:
+                        current[0] += xp
+                        current[1] += messages
+                self._unloaded |= {key for key in unloaded if key not in self._entries}
+                self.failed_flushes += 1
+                logger.warning(f"XP flush failed, {len(rows)} user(s) kept pending")
+                return 0
+
+            # Los usuarios sin cargar aparecen en la clasificación con los totales guardados
+            for result in results:
+                key = (int(result['guild_id']), int(result['user_id']))
+                if key in unloaded and key not in self._entries:
+                    leaderboards.update(key[0], key[1], result['total_xp'], result['new_level'], result['total_messages'])
+
+            self._evict_idle()
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            logger.debug(f"Flushed XP for {len(rows)} user(s)")
+            return len(rows)
+
+    def _evict_idle(self):
+        """Liberar usuarios ya guardados que llevan tiempo sin escribir"""
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [
+            key for key, entry in self._entries.items()
+            if entry.last_seen < cutoff and key not in self._pending
+        ]
+        for key in idle:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        """Métricas del acumulador"""
+        return {
+            'entries': len(self._entries),
+            'pending': len(self._pending),
+            'backlog': len(self._unloaded),
+            'dropped_xp': self.dropped_xp,
+            'flushes': self.flushes,
+            'flushed_rows': self.flushed_rows,
+            'failed_flushes': self.failed_flushes
+        }
@@ -26,14 +26,70 @@ DISCORD_CLIENT_ID = os.getenv('DISCORD_CLIENT_ID')
 DISCORD_CLIENT_SECRET = os.getenv('DISCORD_CLIENT_SECRET')
 BOT_PREFIX = '!'
 
+# Database Backend: 'supabase' (por defecto) o 'sqlite' (local, sin red)
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'supabase').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'botrexy.db')
+
 # Supabase Configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
+# Hilos para ejecutar consultas a la base de datos fuera del event loop del bot
+DB_MAX_WORKERS = int(os.getenv('DB_MAX_WORKERS', 8))
+
+# Circuit breaker por tabla/RPC: fallos seguidos para abrirlo y segundos hasta reintentar
+DB_BREAKER_FAILURES = int(os.getenv('DB_BREAKER_FAILURES', 5))
+DB_BREAKER_RESET = float(os.getenv('DB_BREAKER_RESET', 30))
+# Reintentos de lecturas idempotentes (backoff exponencial con jitter, en segundos)
+DB_READ_RETRIES = 2
+DB_RETRY_BASE_DELAY = 0.2
+DB_RETRY_MAX_DELAY = 2
+
+# Caché de configuración por servidor (segundos de vida y número máximo de filas)
+CONFIG_CACHE_TTL = int(os.getenv('CONFIG_CACHE_TTL', 300))
+CONFIG_CACHE_SIZE = int(os.getenv('CONFIG_CACHE_SIZE', 5000))
+# Servidores por consulta al precargar la configuración en on_ready
+WARMUP_CHUNK_SIZE = 200
+
 # Bot Settings
 XP_PER_MESSAGE = 15
 XP_COOLDOWN = 60
 LEVEL_MULTIPLIER = 100
+# Usuarios por bloque al recalcular los niveles de un servidor
+LEVEL_RECOMPUTE_CHUNK = 1000
+# Filas por consulta al exportar los datos de un servidor
+EXPORT_PAGE_SIZE = 1000
+# Bytes que /exportar mantiene en memoria antes de pasar el archivo a disco
+EXPORT_SPOOL_SIZE = 5 * 1024 * 1024
+# Usuarios por upsert al importar XP de otros bots
+XP_IMPORT_CHUNK = 500
+
+# Acumulador de XP (write-behind): cada cuántos segundos se vuelca a la base de datos,
+# cuántos usuarios pendientes fuerzan un volcado anticipado y cuánto tiempo se
+# mantienen en memoria los usuarios inactivos ya guardados
+XP_FLUSH_INTERVAL = int(os.getenv('XP_FLUSH_INTERVAL', 10))
+XP_FLUSH_MAX_PENDING = int(os.getenv('XP_FLUSH_MAX_PENDING', 500))
+XP_LEDGER_IDLE_TTL = 600
+# Usuarios con XP retenida mientras la base de datos no responde
+XP_BACKLOG_MAX = 10000
+# Clasificaciones en memoria: servidores como máximo y filas por consulta al cargarlas
+LEADERBOARD_MAX_GUILDS = 1000
+LEADERBOARD_SEED_PAGE = 1000
+
+# Anuncios de subida de nivel: segundos para agrupar las subidas de un canal en un
+# solo embed, envíos seguidos por canal, segundos para recuperar cada envío y
+# usuarios como máximo por embed
+LEVELUP_COALESCE_WINDOW = 3
+LEVELUP_CHANNEL_BURST = 2
+LEVELUP_CHANNEL_INTERVAL = 15
+LEVELUP_EMBED_MAX_USERS = 20
+
+# Tarjetas de nivel (/nivel): hilos de renderizado, tarjetas y avatares en caché,
+# segundos de vida y tramos de la barra de XP
+RANK_CARD_WORKERS = 2
+RANK_CARD_CACHE_SIZE = 500
+RANK_CARD_CACHE_TTL = 600
+RANK_CARD_XP_BUCKETS = 20
 
 # Automod Settings
 MAX_MENTIONS = 5
@@ -41,6 +97,29 @@ MAX_EMOJIS = 10
 SPAM_THRESHOLD = 5
 SPAM_INTERVAL = 5
 
+# Logs de moderación: tamaño máximo de la cola, filas por INSERT y segundos máximos de espera
+MODLOG_QUEUE_SIZE = 10000
+MODLOG_BATCH_SIZE = 100
+MODLOG_FLUSH_INTERVAL = 2
+# Logs retenidos mientras la base de datos no responde y espera entre reintentos (segundos)
+MODLOG_BACKLOG_MAX = 10000
+MODLOG_RETRY_BASE_DELAY = 1
+MODLOG_RETRY_MAX_DELAY = 60
+
+# Planificador de eventos: tareas simultáneas, tamaño de la cola de cada prioridad,
+# retraso del event loop (segundos) que activa el modo sobrecarga, cada cuánto se mide
+# y fracción de concesiones de XP que se aceptan durante la sobrecarga
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 4))
+SCHEDULER_QUEUE_SIZES = {'moderation': 1000, 'welcome': 500, 'xp': 2000, 'presence': 10}
+SCHEDULER_LAG_THRESHOLD = 0.25
+SCHEDULER_LAG_INTERVAL = 0.5
+SCHEDULER_XP_SAMPLE_RATE = 0.2
+# Segundos que el apagado espera a que termine el trabajo de moderación y bienvenida en cola
+SCHEDULER_DRAIN_TIMEOUT = 10
+
+# Métricas: si se define, /metrics exige este token (cabecera Authorization: Bearer <token>)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 # Discord OAuth2
 DISCORD_API_BASE = 'https://discord.com/api/v10'
 OAUTH2_SCOPES = ['identify', 'guilds']
\ No newline at end of file
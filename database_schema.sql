@@ -9,6 +9,9 @@ CREATE TABLE IF NOT EXISTS guilds (
     levels_enabled BOOLEAN DEFAULT true,
     welcome_enabled BOOLEAN DEFAULT false,
     verification_enabled BOOLEAN DEFAULT false,
+    level_curve TEXT DEFAULT 'quadratic',
+    level_multiplier INTEGER DEFAULT 100,
+    levelup_channel_id TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -70,6 +73,10 @@ CREATE INDEX IF NOT EXISTS idx_users_guild_id ON users(guild_id);
 CREATE INDEX IF NOT EXISTS idx_users_level ON users(guild_id, level DESC, xp DESC);
 CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_id ON moderation_logs(guild_id);
 CREATE INDEX IF NOT EXISTS idx_moderation_logs_created_at ON moderation_logs(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_created ON moderation_logs(guild_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_user ON moderation_logs(guild_id, user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_moderator ON moderation_logs(guild_id, moderator_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_action ON moderation_logs(guild_id, action, created_at DESC, id DESC);
 
 -- Función para actualizar updated_at automáticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -122,6 +129,87 @@ CREATE TRIGGER update_verification_config_updated_at BEFORE UPDATE ON verificati
 CREATE TRIGGER update_game_roles_config_updated_at BEFORE UPDATE ON game_roles_config
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Función para sumar de forma atómica la XP acumulada de muchos usuarios según la curva de su servidor
+-- (quadratic: nivel = floor(sqrt(xp / multiplicador)); linear: nivel = xp / multiplicador)
+-- p_rows: [{"guild_id", "user_id", "xp", "messages", "curve", "multiplier"}, ...] sin repetidos
+CREATE OR REPLACE FUNCTION increment_users_xp(p_rows JSONB)
+RETURNS TABLE (guild_id TEXT, user_id TEXT, leveled_up BOOLEAN, new_level INTEGER, total_xp INTEGER, total_messages INTEGER) AS $$
+    -- Primer volcado de un usuario: crear su fila
+    INSERT INTO users (guild_id, user_id, xp, level, messages)
+    SELECT r.guild_id, r.user_id, 0, 0, 0
+    FROM jsonb_to_recordset(p_rows) AS r(guild_id TEXT, user_id TEXT)
+    ON CONFLICT (guild_id, user_id) DO NOTHING;
+
+    -- Las filas se bloquean en orden de id para que dos volcados simultáneos no se interbloqueen
+    UPDATE users u
+    SET xp = u.xp + prev.xp_delta,
+        messages = u.messages + prev.messages_delta,
+        level = GREATEST(u.level, CASE prev.curve
+            WHEN 'linear' THEN (u.xp + prev.xp_delta) / prev.multiplier
+            ELSE FLOOR(SQRT((u.xp + prev.xp_delta) / prev.multiplier))::INTEGER
+        END)
+    FROM (
+        SELECT t.id, t.level AS old_level, r.xp AS xp_delta, r.messages AS messages_delta, r.curve, r.multiplier
+        FROM users t
+        JOIN jsonb_to_recordset(p_rows) AS r(guild_id TEXT, user_id TEXT, xp INTEGER, messages INTEGER, curve TEXT, multiplier INTEGER)
+            ON t.guild_id = r.guild_id AND t.user_id = r.user_id
+        ORDER BY t.id
+        FOR UPDATE OF t
+    ) prev
+    WHERE u.id = prev.id
+    RETURNING u.guild_id, u.user_id, u.level > prev.old_level, u.level, u.xp, u.messages;
+$$ LANGUAGE sql;
+
+-- Función para obtener o crear filas en una sola petición (get-or-create)
+CREATE OR REPLACE FUNCTION get_or_create_row(
+    p_table TEXT,
+    p_key JSONB,
+    p_defaults JSONB DEFAULT '{}'::jsonb
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_data JSONB := p_defaults || p_key;
+    v_columns TEXT;
+    v_conflict TEXT;
+    v_where TEXT;
+    v_row JSONB;
+BEGIN
+    IF p_table NOT IN ('guilds', 'users', 'welcome_config', 'automod_config', 'verification_config', 'game_roles_config') THEN
+        RAISE EXCEPTION 'get_or_create_row: tabla no permitida %', p_table;
+    END IF;
+
+    SELECT string_agg(quote_ident(k), ', ') INTO v_columns FROM jsonb_object_keys(v_data) AS k;
+    SELECT string_agg(quote_ident(k), ', ') INTO v_conflict FROM jsonb_object_keys(p_key) AS k;
+    SELECT string_agg(format('t.%I = %L', key, value), ' AND ') INTO v_where FROM jsonb_each_text(p_key);
+
+    -- El SELECT ve la tabla antes del INSERT: devuelve la fila existente o, si no
+    -- había ninguna, la recién insertada por el CTE
+    EXECUTE format(
+        'WITH ins AS ('
+        '    INSERT INTO %1$I (%2$s) SELECT %2$s FROM jsonb_populate_record(NULL::%1$I, $1)'
+        '    ON CONFLICT (%3$s) DO NOTHING RETURNING *'
+        ') '
+        'SELECT to_jsonb(ins) FROM ins '
+        'UNION ALL SELECT to_jsonb(t) FROM %1$I t WHERE %4$s '
+        'LIMIT 1',
+        p_table, v_columns, v_conflict, v_where
+    ) INTO v_row USING v_data;
+
+    RETURN v_row;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Función para leer toda la configuración de un servidor en una sola petición
+CREATE OR REPLACE FUNCTION get_guild_settings(p_guild_id TEXT)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'guild', (SELECT to_jsonb(g) FROM guilds g WHERE g.guild_id = p_guild_id),
+        'automod', (SELECT to_jsonb(a) FROM automod_config a WHERE a.guild_id = p_guild_id),
+        'welcome', (SELECT to_jsonb(w) FROM welcome_config w WHERE w.guild_id = p_guild_id),
+        'verification', (SELECT to_jsonb(v) FROM verification_config v WHERE v.guild_id = p_guild_id)
+    );
+$$ LANGUAGE sql STABLE;
+
 -- Comentarios para documentación
 COMMENT ON TABLE guilds IS 'Configuración general de cada servidor de Discord';
 COMMENT ON TABLE users IS 'Datos de usuarios, niveles y experiencia por servidor';
@@ -0,0 +1,134 @@
+-- BotRexy Database Schema para SQLite (DATABASE_BACKEND=sqlite)
+-- Mismas tablas que database_schema.sql. Se aplica automáticamente al abrir la base de datos.
+-- Las columnas JSONB se guardan como TEXT con JSON y los BOOLEAN como INTEGER (0/1).
+
+-- Tabla de configuración de servidores
+CREATE TABLE IF NOT EXISTS guilds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT UNIQUE NOT NULL,
+    prefix TEXT DEFAULT '!',
+    automod_enabled INTEGER DEFAULT 0,
+    levels_enabled INTEGER DEFAULT 1,
+    welcome_enabled INTEGER DEFAULT 0,
+    verification_enabled INTEGER DEFAULT 0,
+    level_curve TEXT DEFAULT 'quadratic',
+    level_multiplier INTEGER DEFAULT 100,
+    levelup_channel_id TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de usuarios y niveles
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    xp INTEGER DEFAULT 0,
+    level INTEGER DEFAULT 0,
+    messages INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    UNIQUE(guild_id, user_id)
+);
+
+-- Tabla de configuración de bienvenida
+CREATE TABLE IF NOT EXISTS welcome_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT UNIQUE NOT NULL,
+    channel_id TEXT,
+    message TEXT DEFAULT '¡Bienvenido {user} a {server}!',
+    image_enabled INTEGER DEFAULT 1,
+    image_background TEXT DEFAULT '#7289da',
+    image_text_color TEXT DEFAULT '#ffffff',
+    background_image_url TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de configuración de automoderación
+CREATE TABLE IF NOT EXISTS automod_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT UNIQUE NOT NULL,
+    anti_spam INTEGER DEFAULT 1,
+    anti_links INTEGER DEFAULT 0,
+    anti_invites INTEGER DEFAULT 1,
+    bad_words TEXT DEFAULT '[]',
+    max_mentions INTEGER DEFAULT 5,
+    max_emojis INTEGER DEFAULT 10,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de logs de moderación
+CREATE TABLE IF NOT EXISTS moderation_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    moderator_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    reason TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de configuración de verificación
+CREATE TABLE IF NOT EXISTS verification_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT UNIQUE NOT NULL,
+    channel_id TEXT,
+    verified_role_id TEXT,
+    message TEXT DEFAULT '¡Bienvenido! Por favor verifica que eres humano.',
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de configuración de roles de juegos
+CREATE TABLE IF NOT EXISTS game_roles_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id TEXT UNIQUE NOT NULL,
+    channel_id TEXT,
+    message_id TEXT,
+    roles TEXT DEFAULT '{}',
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Índices para mejorar el rendimiento
+CREATE INDEX IF NOT EXISTS idx_users_guild_id ON users(guild_id);
+CREATE INDEX IF NOT EXISTS idx_users_level ON users(guild_id, level DESC, xp DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_id ON moderation_logs(guild_id);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_created_at ON moderation_logs(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_created ON moderation_logs(guild_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_user ON moderation_logs(guild_id, user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_moderator ON moderation_logs(guild_id, moderator_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_action ON moderation_logs(guild_id, action, created_at DESC, id DESC);
+
+-- Triggers para actualizar updated_at
+CREATE TRIGGER IF NOT EXISTS update_guilds_updated_at AFTER UPDATE ON guilds
+BEGIN
+    UPDATE guilds SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_users_updated_at AFTER UPDATE ON users
+BEGIN
+    UPDATE users SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_welcome_config_updated_at AFTER UPDATE ON welcome_config
+BEGIN
+    UPDATE welcome_config SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_automod_config_updated_at AFTER UPDATE ON automod_config
+BEGIN
+    UPDATE automod_config SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_verification_config_updated_at AFTER UPDATE ON verification_config
+BEGIN
+    UPDATE verification_config SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_game_roles_config_updated_at AFTER UPDATE ON game_roles_config
+BEGIN
+    UPDATE game_roles_config SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
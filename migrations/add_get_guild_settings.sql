@@ -0,0 +1,14 @@
+-- Migración: Función get_guild_settings para leer toda la configuración de un servidor
+-- Fecha: 2026-10-18
+-- Descripción: Devuelve en una sola petición las filas de guilds, automod_config,
+-- welcome_config y verification_config de un servidor (NULL en las que no existan).
+
+CREATE OR REPLACE FUNCTION get_guild_settings(p_guild_id TEXT)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'guild', (SELECT to_jsonb(g) FROM guilds g WHERE g.guild_id = p_guild_id),
+        'automod', (SELECT to_jsonb(a) FROM automod_config a WHERE a.guild_id = p_guild_id),
+        'welcome', (SELECT to_jsonb(w) FROM welcome_config w WHERE w.guild_id = p_guild_id),
+        'verification', (SELECT to_jsonb(v) FROM verification_config v WHERE v.guild_id = p_guild_id)
+    );
+$$ LANGUAGE sql STABLE;
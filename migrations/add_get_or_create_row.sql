@@ -0,0 +1,43 @@
+-- Migración: Función get_or_create_row para obtener o crear filas en una sola petición
+-- Fecha: 2026-10-18
+-- Descripción: Sustituye el patrón SELECT + INSERT de los métodos get_* de Database.
+-- Inserta la fila con los valores por defecto si no existe (ON CONFLICT DO NOTHING)
+-- y devuelve la fila (nueva o existente) como JSON, sin reescribir las existentes.
+
+CREATE OR REPLACE FUNCTION get_or_create_row(
+    p_table TEXT,
+    p_key JSONB,
+    p_defaults JSONB DEFAULT '{}'::jsonb
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_data JSONB := p_defaults || p_key;
+    v_columns TEXT;
+    v_conflict TEXT;
+    v_where TEXT;
+    v_row JSONB;
+BEGIN
+    IF p_table NOT IN ('guilds', 'users', 'welcome_config', 'automod_config', 'verification_config', 'game_roles_config') THEN
+        RAISE EXCEPTION 'get_or_create_row: tabla no permitida %', p_table;
+    END IF;
+
+    SELECT string_agg(quote_ident(k), ', ') INTO v_columns FROM jsonb_object_keys(v_data) AS k;
+    SELECT string_agg(quote_ident(k), ', ') INTO v_conflict FROM jsonb_object_keys(p_key) AS k;
+    SELECT string_agg(format('t.%I = %L', key, value), ' AND ') INTO v_where FROM jsonb_each_text(p_key);
+
+    -- El SELECT ve la tabla antes del INSERT: devuelve la fila existente o, si no
+    -- había ninguna, la recién insertada por el CTE
+    EXECUTE format(
+        'WITH ins AS ('
+        '    INSERT INTO %1$I (%2$s) SELECT %2$s FROM jsonb_populate_record(NULL::%1$I, $1)'
+        '    ON CONFLICT (%3$s) DO NOTHING RETURNING *'
+        ') '
+        'SELECT to_jsonb(ins) FROM ins '
+        'UNION ALL SELECT to_jsonb(t) FROM %1$I t WHERE %4$s '
+        'LIMIT 1',
+        p_table, v_columns, v_conflict, v_where
+    ) INTO v_row USING v_data;
+
+    RETURN v_row;
+END;
+$$ LANGUAGE plpgsql;
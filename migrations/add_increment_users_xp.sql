@@ -0,0 +1,40 @@
+-- Migración: Función increment_users_xp para sumar la XP de muchos usuarios de forma atómica
+-- Fecha: 2026-10-18
+-- Descripción: Suma a cada usuario los incrementos de XP y mensajes acumulados por el bot
+-- (XPLedger) y recalcula su nivel con la curva de su servidor, en una sola petición.
+-- Al sumar en el servidor en lugar de escribir totales, un volcado nunca pisa un reseteo,
+-- una importación ni la XP que escribe otro proceso del bot.
+-- Se puede aplicar en cualquier orden respecto a las demás migraciones.
+
+-- Versiones anteriores de la función por usuario, ya sin uso (si la base de datos las tiene)
+DROP FUNCTION IF EXISTS increment_user_xp(TEXT, TEXT, INTEGER, INTEGER);
+DROP FUNCTION IF EXISTS increment_user_xp(TEXT, TEXT, INTEGER, INTEGER, TEXT);
+
+-- p_rows: [{"guild_id", "user_id", "xp", "messages", "curve", "multiplier"}, ...] sin repetidos
+CREATE OR REPLACE FUNCTION increment_users_xp(p_rows JSONB)
+RETURNS TABLE (guild_id TEXT, user_id TEXT, leveled_up BOOLEAN, new_level INTEGER, total_xp INTEGER, total_messages INTEGER) AS $$
+    -- Primer volcado de un usuario: crear su fila
+    INSERT INTO users (guild_id, user_id, xp, level, messages)
+    SELECT r.guild_id, r.user_id, 0, 0, 0
+    FROM jsonb_to_recordset(p_rows) AS r(guild_id TEXT, user_id TEXT)
+    ON CONFLICT (guild_id, user_id) DO NOTHING;
+
+    -- Las filas se bloquean en orden de id para que dos volcados simultáneos no se interbloqueen
+    UPDATE users u
+    SET xp = u.xp + prev.xp_delta,
+        messages = u.messages + prev.messages_delta,
+        level = GREATEST(u.level, CASE prev.curve
+            WHEN 'linear' THEN (u.xp + prev.xp_delta) / prev.multiplier
+            ELSE FLOOR(SQRT((u.xp + prev.xp_delta) / prev.multiplier))::INTEGER
+        END)
+    FROM (
+        SELECT t.id, t.level AS old_level, r.xp AS xp_delta, r.messages AS messages_delta, r.curve, r.multiplier
+        FROM users t
+        JOIN jsonb_to_recordset(p_rows) AS r(guild_id TEXT, user_id TEXT, xp INTEGER, messages INTEGER, curve TEXT, multiplier INTEGER)
+            ON t.guild_id = r.guild_id AND t.user_id = r.user_id
+        ORDER BY t.id
+        FOR UPDATE OF t
+    ) prev
+    WHERE u.id = prev.id
+    RETURNING u.guild_id, u.user_id, u.level > prev.old_level, u.level, u.xp, u.messages;
+$$ LANGUAGE sql;
@@ -0,0 +1,8 @@
+-- Migración: Curvas de niveles por servidor
+-- Fecha: 2026-10-18
+-- Descripción: Agrega guilds.level_curve ('quadratic' o 'linear') y guilds.level_multiplier.
+-- increment_users_xp (add_increment_users_xp.sql) calcula el nivel con la curva que se le pase.
+-- Después de cambiar la curva de un servidor hay que recalcular sus niveles (/curvaniveles).
+
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS level_curve TEXT DEFAULT 'quadratic';
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS level_multiplier INTEGER DEFAULT 100;
@@ -0,0 +1,6 @@
+-- Migración: Canal de anuncios de subida de nivel
+-- Fecha: 2026-10-18
+-- Descripción: Agrega guilds.levelup_channel_id. Si se define, los anuncios de subida de
+-- nivel se envían a ese canal en lugar de al canal donde se escribió el mensaje (/canalniveles).
+
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS levelup_channel_id TEXT;
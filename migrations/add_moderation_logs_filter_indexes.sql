@@ -0,0 +1,11 @@
+-- Migración: Índices para filtrar los logs de moderación
+-- Fecha: 2026-10-18
+-- Descripción: /modlogs y la página de logs filtran por usuario, moderador, acción y rango
+-- de fechas dentro de un servidor. Cada índice sirve un filtro en el orden de la consulta
+-- (created_at DESC, id DESC), así que ninguna necesita ordenar ni recorrer otros servidores.
+-- El filtro solo por fechas ya lo cubre idx_moderation_logs_guild_created
+-- (guild_id, created_at DESC, id DESC) de add_moderation_logs_keyset_index.sql.
+
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_user ON moderation_logs(guild_id, user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_moderator ON moderation_logs(guild_id, moderator_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_action ON moderation_logs(guild_id, action, created_at DESC, id DESC);
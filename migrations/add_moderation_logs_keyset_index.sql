@@ -0,0 +1,6 @@
+-- Migración: Índice para paginar los logs de moderación por cursor
+-- Fecha: 2026-10-18
+-- Descripción: Las páginas de logs se piden con WHERE guild_id = ? AND (created_at, id) < (?, ?)
+-- ORDER BY created_at DESC, id DESC; este índice las resuelve sin ordenar ni saltar filas.
+
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_created ON moderation_logs(guild_id, created_at DESC, id DESC);
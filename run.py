@@ -37,7 +37,7 @@ if __name__ == "__main__":
         logger.error("DISCORD_TOKEN no está configurado. Por favor configura las variables de entorno.")
         sys.exit(1)
     
-    if not config.SUPABASE_URL or not config.SUPABASE_KEY:
+    if config.DATABASE_BACKEND == 'supabase' and (not config.SUPABASE_URL or not config.SUPABASE_KEY):
         logger.error("SUPABASE_URL o SUPABASE_KEY no están configurados. Por favor configura las variables de entorno.")
         sys.exit(1)
     
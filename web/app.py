@@ -27,7 +27,7 @@ CORS(app)
 csrf = CSRFProtect(app)
 
 # Importar rutas
-from web.routes import auth, dashboard, legal
+from web.routes import auth, dashboard, legal, metrics
 from web.routes.welcome_config import bp as welcome_bp
 from web.routes.game_roles import bp as game_roles_bp
 from web.routes.verification_routes import verification_bp
@@ -39,6 +39,7 @@ app.register_blueprint(welcome_bp)
 app.register_blueprint(game_roles_bp)
 app.register_blueprint(legal.bp)
 app.register_blueprint(verification_bp)
+app.register_blueprint(metrics.bp)
 
 @app.route('/')
 def index():
@@ -1,13 +1,66 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
-from bot.utils.database import db
+from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify, Response, stream_with_context
+from bot.utils.database import db, MODERATION_ACTIONS
+from bot.utils.pagination import clamp_limit
+from bot.utils.export import export_guild_data, export_filename
+from bot.utils.xp_import import xp_imports, IMPORT_FORMATS
 from bot import bot
+import datetime
 import logging
+import os
+import tempfile
 import discord
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
+# Tamaño máximo de página de leaderboard y logs
+MAX_PAGE_SIZE = 100
+
+def parse_modlog_filters(args):
+    """Leer los filtros de logs de la query string.
+
+    Devuelve (filtros para Database, valores originales para el formulario y los enlaces).
+    Lanza ValueError si algún filtro no es válido.
+    """
+    filters = {}
+    values = {}
+    for name in ('user_id', 'moderator_id'):
+        value = args.get(name, '').strip()
+        if value:
+            filters[name] = int(value)
+            values[name] = value
+
+    action = args.get('action', '').strip()
+    if action:
+        if action not in MODERATION_ACTIONS:
+            raise ValueError(f"Acción no válida: {action}")
+        filters['action'] = action
+        values['action'] = action
+
+    for name in ('since', 'until'):
+        value = args.get(name, '').strip()
+        if value:
+            date = datetime.datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+            # "Hasta" incluye el día indicado
+            filters[name] = date + datetime.timedelta(days=1) if name == 'until' else date
+            values[name] = value
+
+    return filters, values
+
+def import_format(filename: str):
+    """(formato, comprimido) de un archivo de importación según su extensión, o None si no se admite"""
+    name = filename.lower()
+    compressed = name.endswith('.gz')
+    if compressed:
+        name = name[:-3]
+    extension = name.rsplit('.', 1)[-1]
+    # JSONL se lee igual que JSON (un objeto por línea)
+    fmt = 'json' if extension == 'jsonl' else extension
+    if '.' not in name or fmt not in IMPORT_FORMATS:
+        return None
+    return fmt, compressed
+
 def login_required(f):
     """Decorador para requerir login"""
     def decorated_function(*args, **kwargs):
@@ -104,14 +157,42 @@ def get_leaderboard(guild_id):
         if not any(g['id'] == guild_id for g in guilds):
             return jsonify({'error': 'Unauthorized'}), 403
         
-        limit = request.args.get('limit', 10, type=int)
-        leaderboard = db.get_leaderboard(int(guild_id), limit)
+        limit = clamp_limit(request.args.get('limit', type=int), 10, MAX_PAGE_SIZE)
+        page = db.get_leaderboard_page(int(guild_id), limit, request.args.get('cursor'))
         
-        return jsonify(leaderboard)
+        # El cursor de la siguiente página va en una cabecera para no cambiar el formato de la respuesta
+        response = jsonify(page['items'])
+        if page['next_cursor']:
+            response.headers['X-Next-Cursor'] = page['next_cursor']
+        return response
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         logger.error(f"Error getting leaderboard: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@bp.route('/api/server/<guild_id>/rank/<user_id>', methods=['GET'])
+@login_required
+def get_user_rank(guild_id, user_id):
+    """Obtener la posición de un usuario y sus vecinos en el leaderboard"""
+    try:
+        # Verificar acceso
+        guilds = session.get('guilds', [])
+        if not any(g['id'] == guild_id for g in guilds):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        neighbors = min(max(request.args.get('neighbors', 1, type=int), 0), 10)
+        rank = db.get_user_rank(int(guild_id), int(user_id), neighbors)
+        if rank is None:
+            return jsonify({'error': 'Not found'}), 404
+
+        return jsonify(rank)
+    except ValueError:
+        return jsonify({'error': 'Invalid user id'}), 400
+    except Exception as e:
+        logger.error(f"Error getting user rank: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @bp.route('/api/server/<guild_id>/modlogs', methods=['GET'])
 @login_required
 def get_modlogs(guild_id):
@@ -122,14 +203,102 @@ def get_modlogs(guild_id):
         if not any(g['id'] == guild_id for g in guilds):
             return jsonify({'error': 'Unauthorized'}), 403
         
-        limit = request.args.get('limit', 50, type=int)
-        logs = db.get_moderation_logs(int(guild_id), limit)
+        limit = clamp_limit(request.args.get('limit', type=int), 50, MAX_PAGE_SIZE)
+        filters, _ = parse_modlog_filters(request.args)
+        page = db.get_moderation_logs_page(int(guild_id), limit, request.args.get('cursor'), **filters)
         
-        return jsonify(logs)
+        response = jsonify(page['items'])
+        if page['next_cursor']:
+            response.headers['X-Next-Cursor'] = page['next_cursor']
+        return response
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or filters'}), 400
     except Exception as e:
         logger.error(f"Error getting modlogs: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@bp.route('/api/server/<guild_id>/export/<dataset>', methods=['GET'])
+@login_required
+def export_data(guild_id, dataset):
+    """Descargar todos los usuarios o logs de moderación del servidor (JSONL o CSV comprimido)"""
+    # Verificar acceso
+    guilds = session.get('guilds', [])
+    if not any(g['id'] == guild_id for g in guilds):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    fmt = request.args.get('format', 'jsonl')
+    try:
+        chunks = export_guild_data(db, int(guild_id), dataset, fmt)
+    except ValueError:
+        return jsonify({'error': 'Invalid dataset or format'}), 400
+
+    def generate():
+        try:
+            yield from chunks
+        except Exception as e:
+            # La respuesta ya empezó: el gzip queda truncado y el cliente lo detecta
+            logger.error(f"Error exporting {dataset} for guild {guild_id}: {e}")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/gzip',
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(guild_id, dataset, fmt)}"'}
+    )
+
+@bp.route('/api/server/<guild_id>/import', methods=['POST'])
+@login_required
+def import_xp(guild_id):
+    """Importar XP de otro bot desde un archivo CSV o JSON (opcionalmente .gz)"""
+    try:
+        # Verificar acceso
+        guilds = session.get('guilds', [])
+        if not any(g['id'] == guild_id for g in guilds):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+
+        detected = import_format(file.filename)
+        if detected is None:
+            return jsonify({'error': 'Invalid file type. Use CSV, JSON or JSONL (optionally .gz)'}), 400
+        fmt, compressed = detected
+
+        # El archivo se procesa en segundo plano: se guarda en disco y el hilo lo borra al terminar
+        fd, path = tempfile.mkstemp(prefix=f"botrexy-import-{guild_id}-")
+        os.close(fd)
+        file.save(path)
+
+        levels = bot.get_cog('Levels')
+        on_chunk = None
+        if levels is not None:
+            # Actualizar en el loop del bot los usuarios que el acumulador de XP tiene en memoria
+            on_chunk = lambda rows: bot.loop.call_soon_threadsafe(levels.ledger.replace, int(guild_id), rows)
+
+        job = xp_imports.start(int(guild_id), path, fmt, db.get_level_curve(int(guild_id)), compressed, on_chunk)
+        if job is None:
+            os.remove(path)
+            return jsonify({'error': 'An import is already running for this server'}), 409
+
+        return jsonify(job.to_dict()), 202
+    except Exception as e:
+        logger.error(f"Error starting XP import: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/api/server/<guild_id>/import/<job_id>', methods=['GET'])
+@login_required
+def import_status(guild_id, job_id):
+    """Progreso de una importación de XP"""
+    # Verificar acceso
+    guilds = session.get('guilds', [])
+    if not any(g['id'] == guild_id for g in guilds):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    job = xp_imports.get(int(guild_id), job_id)
+    if job is None:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(job.to_dict())
+
 @bp.route('/server/<guild_id>/leaderboard')
 @login_required
 def leaderboard(guild_id):
@@ -142,8 +311,13 @@ def leaderboard(guild_id):
     if not guild_data:
         return redirect(url_for('dashboard.dashboard'))
     
-    # Obtener datos del leaderboard
-    leaderboard_data = db.get_leaderboard(int(guild_id), limit=100)
+    # Obtener la página del leaderboard
+    cursor = request.args.get('cursor')
+    try:
+        page = db.get_leaderboard_page(int(guild_id), limit=MAX_PAGE_SIZE, cursor=cursor)
+    except ValueError:
+        return redirect(url_for('dashboard.leaderboard', guild_id=guild_id))
+    leaderboard_data = page['items']
     
     # Enriquecer datos con nombres de usuario
     enriched_data = []
@@ -172,7 +346,8 @@ def leaderboard(guild_id):
         entry['avatar_url'] = avatar_url
         enriched_data.append(entry)
     
-    return render_template('leaderboard.html', user=user, guild=guild_data, leaderboard=enriched_data)
+    return render_template('leaderboard.html', user=user, guild=guild_data, leaderboard=enriched_data,
+                           offset=page['offset'], cursor=cursor, next_cursor=page['next_cursor'])
 
 @bp.route('/server/<guild_id>/logs')
 @login_required
@@ -186,8 +361,14 @@ def logs(guild_id):
     if not guild_data:
         return redirect(url_for('dashboard.dashboard'))
     
-    # Obtener logs
-    logs_data = db.get_moderation_logs(int(guild_id), limit=50)
+    # Obtener la página de logs
+    cursor = request.args.get('cursor')
+    try:
+        filters, filter_values = parse_modlog_filters(request.args)
+        page = db.get_moderation_logs_page(int(guild_id), limit=50, cursor=cursor, **filters)
+    except ValueError:
+        return redirect(url_for('dashboard.logs', guild_id=guild_id))
+    logs_data = page['items']
     
     # Enriquecer datos
     enriched_logs = []
@@ -212,4 +393,6 @@ def logs(guild_id):
         log['user_name'] = user_name
         enriched_logs.append(log)
     
-    return render_template('logs.html', user=user, guild=guild_data, logs=enriched_logs)
+    return render_template('logs.html', user=user, guild=guild_data, logs=enriched_logs,
+                           cursor=cursor, next_cursor=page['next_cursor'],
+                           filters=filter_values, actions=MODERATION_ACTIONS)
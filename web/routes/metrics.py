@@ -0,0 +1,21 @@
+from flask import Blueprint, session, request, jsonify
+from bot.utils.metrics import metrics
+import config
+import hmac
+
+bp = Blueprint('metrics', __name__)
+
+def _authorized():
+    """Con METRICS_TOKEN exige el token; sin él, una sesión iniciada"""
+    if config.METRICS_TOKEN:
+        auth = request.headers.get('Authorization', '')
+        token = auth[len('Bearer '):] if auth.startswith('Bearer ') else ''
+        return hmac.compare_digest(token, config.METRICS_TOKEN)
+    return 'user' in session
+
+@bp.route('/metrics')
+def get_metrics():
+    """Métricas internas del bot (base de datos, cachés y colas)"""
+    if not _authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(metrics.snapshot())